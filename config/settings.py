@@ -1,5 +1,6 @@
 
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
 import psycopg2
 from psycopg2 import pool
@@ -11,6 +12,21 @@ from sqlmodel import SQLModel, Session, create_engine as create_sqlmodel_engine
 
 load_dotenv()
 
+
+@lru_cache(maxsize=1)
+def _get_engine(conn_str: str, pool_size: int, max_overflow: int, pool_recycle: int):
+    """创建数据库引擎（进程内单例，多个 Settings 实例共享同一个连接池）"""
+    return create_sqlmodel_engine(
+        conn_str,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=True,
+        echo=False,
+        future=True,
+    )
+
+
 class Settings:
     def __init__(self):
         self.db_url = os.getenv("DATABASE")
@@ -20,9 +36,12 @@ class Settings:
         self.db_port=os.getenv("DATEPORT")
         #创建链接字符
         self.db_conn_str = f"postgresql://{self.db_user}:{self.db_password}@{self.db_url}:{self.db_port}/{self.db_name}"
-        self.pool_size = 10 #连接池大小
-        self.max_overflow = 20 #最大溢出连接数
-        self.engine = create_sqlmodel_engine(self.db_conn_str,pool_size=self.pool_size,max_overflow=self.max_overflow,echo=False)
+        # 连接池配置（可通过环境变量调整）
+        # 注意：pool_size + max_overflow 是单进程的连接上限，多进程部署时总和不能超过 Postgres 的 max_connections（默认100）
+        self.pool_size = int(os.getenv("DB_POOL_SIZE", "10")) #连接池大小
+        self.max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "20")) #最大溢出连接数
+        self.pool_recycle = int(os.getenv("DB_POOL_RECYCLE", "1800")) #连接回收时间（秒），避免使用被服务端关闭的陈旧连接
+        self.engine = _get_engine(self.db_conn_str, self.pool_size, self.max_overflow, self.pool_recycle)
     
     @contextmanager
     def get_session(self):
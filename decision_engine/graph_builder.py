@@ -17,6 +17,16 @@ if TYPE_CHECKING:
     from config.settings import Settings
 
 class GraphBuilder:
+    # 决策流水线节点顺序：START -> coin_pool -> data_collector -> signal_analyzer -> AI_decision -> risk_check -> execution_trade -> END
+    PIPELINE = (
+        "coin_pool",
+        "data_collector",
+        "signal_analyzer",
+        "AI_decision",
+        "risk_check",
+        "execution_trade",
+    )
+
     def __init__(
         self, 
         market_monitor: Optional[MarketMonitor] = None, 
@@ -35,15 +45,19 @@ class GraphBuilder:
             trader_id: 交易员ID
             settings: 设置对象
         """
-        self.graph = StateGraph(DecisionState)
+        self.graph: Optional[StateGraph] = None  # 首次 build_graph 时创建
+        self._compiled = None  # 编译后的图（只编译一次）
         self.market_monitor = market_monitor
         self.trader_cfg = trader_cfg or {}
+        # 数据收集与信号分析共享监控器的APIClient（同一连接池，市场信息只加载一次）
+        api_client = market_monitor.api_client if market_monitor else None
         # 创建节点实例（不再传递exchange_config，节点从state读取）
-        self.data_collector = DataCollector(market_monitor=market_monitor)
+        self.data_collector = DataCollector(market_monitor=market_monitor, api_client=api_client)
         self.coin_pool = CoinPool(trader_cfg, symbol_filter=symbol_filter)
         self.signal_analyzer = SignalAnalyzer(
             trader_id=trader_id, 
-            settings=settings
+            settings=settings,
+            api_client=api_client
         )
         self.AI_decision = AIDecision(
             trader_cfg, 
@@ -62,23 +76,35 @@ class GraphBuilder:
 
 
     def build_graph(self):
-        """构建决策引擎图（批量模式）"""
-        # 节点顺序：START -> coin_pool -> data_collector -> signal_analyzer -> AI_decision -> risk_check -> execution_trade -> END
-        self.graph.add_node("coin_pool", self.coin_pool.get_candidate_coins)
-        self.graph.add_node("data_collector", self.data_collector.run)
-        self.graph.add_node("signal_analyzer", self.signal_analyzer.run)
-        self.graph.add_node("AI_decision", self.AI_decision.run)
-        self.graph.add_node("risk_check", self.risk_check.run)
-        self.graph.add_node("execution_trade", self.execution_trade.run)
+        """构建决策引擎图（批量模式），编译结果缓存在实例上，重复调用直接复用"""
+        if self._compiled is not None:
+            return self._compiled
+        
+        nodes = {
+            "coin_pool": self.coin_pool.get_candidate_coins,
+            "data_collector": self.data_collector.run,
+            "signal_analyzer": self.signal_analyzer.run,
+            "AI_decision": self.AI_decision.run,
+            "risk_check": self.risk_check.run,
+            "execution_trade": self.execution_trade.run,
+        }
         
-        # 边的连接
-        self.graph.add_edge(START, "coin_pool")
-        self.graph.add_edge("coin_pool", "data_collector")
-        self.graph.add_edge("data_collector", "signal_analyzer")
-        self.graph.add_edge("signal_analyzer", "AI_decision")
-        self.graph.add_edge("AI_decision", "risk_check")
-        self.graph.add_edge("risk_check", "execution_trade")
-        self.graph.add_edge("execution_trade", END)
+        # StateGraph 只在真正需要编译时创建一次
+        self.graph = StateGraph(DecisionState)
+        for name in self.PIPELINE:
+            self.graph.add_node(name, nodes[name])
+        
+        # 边的连接（按 PIPELINE 顺序线性连接）
+        for source, target in zip((START,) + self.PIPELINE, self.PIPELINE + (END,)):
+            self.graph.add_edge(source, target)
         
-        compiled_graph = self.graph.compile()
-        return compiled_graph
\ No newline at end of file
+        self._compiled = self.graph.compile()
+        return self._compiled
+
+    def close(self):
+        """释放节点持有的后台资源（事件循环线程、线程池），交易员停止时调用"""
+        self.data_collector.close()
+
+    def invoke(self, state: DecisionState) -> DecisionState:
+        """使用缓存的编译图执行一次决策"""
+        return self.build_graph().invoke(state)
\ No newline at end of file
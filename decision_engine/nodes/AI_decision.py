@@ -2,18 +2,273 @@ from decision_engine.state import DecisionState
 from utils.logger import logger
 from utils.llm_factory import LLMFactory
 from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
 from typing import Optional, List, Dict, Any, TYPE_CHECKING
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
-from decimal import Decimal
+import os
+import re
+import json
+import time
+import numpy as np
+from math import isnan
+from utils._signal_format_njit import classify, PRICE_VS_EMA_TEXT, MACD_SIGNAL_TEXT, RSI_STATUS_TEXT
+
+try:
+    # orjson 可选：解析速度更快，未安装时回退到标准库 json
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 if TYPE_CHECKING:
     from config.settings import Settings
     from services.decision_log_service import DecisionLogService
 
 
+# 持仓格式化中按顺序读取的字段
+_POS_KEYS = ('symbol', 'side', 'leverage', 'marginMode')
+_MARGIN_MODE_TEXT = {'cross': '全仓', 'isolated': '逐仓'}
+
+
+# 单个持仓的输出模板，value_line 为可选的"持仓价值"行（含前导换行）
+_POS_TEMPLATE = (
+    "  {symbol}:\n"
+    "    - 方向: {side}\n"
+    "    - 数量: {size:.4f}\n"
+    "    - 杠杆: {leverage}x\n"
+    "    - 保证金模式: {margin_mode}\n"
+    "    - 开仓价: {entry_price:.2f}\n"
+    "    - 标记价: {mark_price}"
+    "{value_line}\n"
+    "    - 未实现盈亏: {unrealized_pnl:+.2f} USDT ({pnl_percent:+.2f}%) [{pnl_status}]\n"
+    "    - 清算价格: {liq_price}\n"
+    "    - 已用保证金: {margin_used} USDT"
+)
+
+
+def _to_float(value: Any, default: float = 0.0) -> float:
+    """安全转换为float（None或无法转换时返回default）"""
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return default
+
+
+def _fmt_price_or_na(value: float) -> str:
+    """NaN（字段缺失）输出 N/A，否则保留两位小数"""
+    return 'N/A' if isnan(value) else f'{value:.2f}'
+
+
+def _fmt_position(row: tuple) -> str:
+    """将 _format_positions 按列预处理后的一行数据一次性填入 _POS_TEMPLATE"""
+    (pos, info_pos, size, entry_price, mark_price, unrealized_pnl,
+     liq_price, margin_used, position_value, pnl_percent) = row
+    symbol, side, leverage, margin_mode = (pos.get(k) for k in _POS_KEYS)
+    
+    # 提取杠杆（使用 leverage 字段，否则从 info.position.leverage.value 获取）
+    if leverage is None:
+        leverage_dict = info_pos.get('leverage', {})
+        leverage = leverage_dict.get('value') if isinstance(leverage_dict, dict) else 1
+    
+    return _POS_TEMPLATE.format(
+        symbol=symbol or 'N/A',
+        side=side or 'N/A',
+        size=size,
+        leverage=int(_to_float(leverage, 1)),
+        margin_mode=_MARGIN_MODE_TEXT.get(margin_mode, str(margin_mode or 'N/A')),
+        entry_price=entry_price,
+        mark_price=_fmt_price_or_na(mark_price),
+        value_line='' if isnan(position_value) else f"\n    - 持仓价值: {position_value:.2f} USDT",
+        unrealized_pnl=unrealized_pnl,
+        pnl_percent=pnl_percent,
+        pnl_status="盈利" if unrealized_pnl > 0 else "亏损" if unrealized_pnl < 0 else "持平",
+        liq_price=_fmt_price_or_na(liq_price),
+        margin_used=_fmt_price_or_na(margin_used),
+    )
+
+
+def _fmt_series(vals: list, n: int = 10, fmt: str = '%.2f') -> str:
+    """格式化序列最近n个值为逗号分隔的文本（向量化处理，NaN/None 显示为 N/A）"""
+    arr = np.asarray(vals[-n:], dtype=np.float64)
+    if arr.size == 0:
+        return "N/A"
+    return ", ".join(np.where(np.isnan(arr), 'N/A', np.char.mod(fmt, arr)).tolist())
+
+
+def _summarize_klines(klines: list) -> Optional[str]:
+    """将K线压缩为单行统计摘要（区间高低点、VWAP、区间涨跌幅、收益率分位数），替代逐根K线原始数据"""
+    if not klines:
+        return None
+    
+    n = len(klines)
+    high = np.fromiter((k.high for k in klines), dtype=np.float64, count=n)
+    low = np.fromiter((k.low for k in klines), dtype=np.float64, count=n)
+    close = np.fromiter((k.close for k in klines), dtype=np.float64, count=n)
+    volume = np.fromiter((k.volume for k in klines), dtype=np.float64, count=n)
+    
+    vol_sum = volume.sum()
+    vwap = (close * volume).sum() / vol_sum if vol_sum > 0 else close[-1]
+    ret = (close[-1] / klines[0].open - 1) * 100 if klines[0].open else 0.0
+    if n > 1:
+        bar_returns = np.diff(close) / close[:-1] * 100
+        p10, p50, p90 = np.percentile(bar_returns, [10, 50, 90])
+        returns_str = f"单根涨跌幅P10/P50/P90 {p10:+.2f}%/{p50:+.2f}%/{p90:+.2f}%"
+    else:
+        returns_str = "单根涨跌幅 N/A"
+    
+    return (
+        f"{n}根 | 开 {klines[0].open:.2f} 高 {high.max():.2f} 低 {low.min():.2f} 收 {close[-1]:.2f} | "
+        f"区间涨跌 {ret:+.2f}% | VWAP {vwap:.2f} | {returns_str}"
+    )
+
+
+# 单个币种信号数据模板（模块加载时拼接一次，每个币种只做一次 str.format）
+_SIGNAL_TEMPLATE = "\n".join((
+    "  {symbol}:",
+    "    【价格信息】",
+    "      - 当前价格: {current_price:.2f}",
+    "      - 1小时涨跌: {price_change_1h:+.2f}%",
+    "      - 4小时涨跌: {price_change_4h:+.2f}%",
+    "    【3分钟指标】",
+    "      - EMA20: {ema20_3m:.2f} (价格{price_vs_ema20_3m}EMA20)",
+    "      - MACD: {macd_3m:.2f} ({macd_signal_3m})",
+    "      - RSI7: {rsi7_3m:.2f}",
+    "      - RSI14: {rsi14_3m:.2f} ({rsi_status_3m})",
+    "    【4小时指标】",
+    "      - EMA20: {ema20_4h:.2f} (价格{price_vs_ema20_4h}EMA20)",
+    "      - EMA50: {ema50_4h:.2f}",
+    "      - MACD: {macd_4h:.2f} ({macd_signal_4h})",
+    "      - RSI7: {rsi7_4h:.2f}",
+    "      - RSI14: {rsi14_4h:.2f} ({rsi_status_4h})",
+    "      - ATR14: {atr_4h:.2f} (波动率)",
+    "      - ATR3: {atr3_4h:.2f} (短期波动率)",
+    "    【成交量统计（4小时）】",
+    "      - 当前成交量: {current_volume_4h:.2f}",
+    "      - 平均成交量: {average_volume_4h:.2f}",
+    "    【持仓量与资金费率】",
+    "      - 持仓量 (Latest): {oi_str}",
+    "      - 持仓量 (Average): {oi_avg_str}",
+    "      - 资金费率: {funding_rate_str}",
+    "    【3分钟序列数据摘要】",
+    "{intraday_summary}",
+    "    【4小时序列数据摘要】",
+    "{longer_term_summary}",
+))
+
+
+# 用户提示词模板（静态骨架在模块加载时定义一次，每次决策仅做 format_map 填充）
+_USER_PROMPT_HEAD_TMPL = """
+# 交易决策分析请求
+
+## 一、运行状态
+- 当前时间: {current_time}
+- 运行时长: {runtime_minutes} 分钟
+- 调用次数: {call_count}
+
+## 二、账户信息
+{account_info_str}
+- 当前持仓数量: {positions_count} 个
+
+## 三、性能分析
+{performance_info}
+
+## 四、持仓详情
+{positions_info}
+
+## 五、候选币种及来源
+{candidate_coins_info}
+
+## 六、OI Top 数据（持仓量增长Top币种）
+{oi_top_info}
+
+## 七、市场警报
+{alerts_info}
+
+## 八、市场数据与技术指标
+{market_info}
+
+{signal_info}
+
+"""
+
+# 用户提示词静态尾部（交易配置），只依赖交易员杠杆配置，在初始化时渲染一次
+_USER_PROMPT_TAIL_TMPL = """## 九、交易配置
+- BTC/ETH 杠杆上限: {btc_eth_leverage}x
+- 山寨币杠杆上限: {altcoin_leverage}x
+"""
+
+# 决策规则（决策要求、输出格式、约束及示例），每次决策都相同，在初始化时渲染一次并追加到系统提示词，
+# 不随用户提示词重复发送；固定的系统提示词前缀也更容易命中模型服务端的前缀缓存
+_DECISION_RULES_TMPL = """## 决策要求
+请根据用户消息中的运行状态、账户、持仓与市场数据，对每个候选币种和现有持仓进行综合分析，并给出交易决策：
+
+### 对于候选币种（开仓决策）：
+1. 分析K线数据，识别价格趋势和形态
+2. 结合3分钟和4小时指标，评估多时间框架信号
+3. 观察序列数据的变化趋势
+4. 参考 OI Top 数据（如果可用），评估持仓量变化
+5. 考虑账户余额和现有持仓情况
+6. 给出明确的交易建议：开多、开空或等待
+
+### 对于现有持仓（平仓决策）：
+1. 评估持仓的盈亏情况
+2. 分析当前市场信号是否支持继续持有
+3. 考虑清算价格风险
+4. 给出明确的交易建议：平多、平空或持有
+
+### 决策格式要求：
+请以结构化的JSON数组格式返回决策结果，每个决策包含：
+- symbol: 币种符号（如 "BTC/USDT"）
+- action: 操作类型，必须是以下之一：
+  - "open_long": 开多仓
+  - "open_short": 开空仓
+  - "close_long": 平多仓
+  - "close_short": 平空仓
+  - "hold": 持有（对现有持仓）
+  - "wait": 等待（对候选币种，暂不开仓）
+- leverage: 杠杆倍数（开仓时必填，1-{altcoin_leverage}，BTC/ETH最高{btc_eth_leverage}）
+- position_size_usd: 仓位大小（USD，开仓时必填）
+- stop_loss: 止损价格（开仓时必填，必须>0）
+- take_profit: 止盈价格（开仓时必填，必须>0）
+- confidence: 信心度 (0-100)
+- risk_usd: 最大美元风险（开仓时必填）
+- reasoning: 决策理由（需引用具体的K线形态、指标信号、OI Top数据等）
+
+### 重要约束：
+1. **风险回报比必须≥3:1（收益/风险 ≥ 3）**
+   - 这是硬性要求，所有开仓决策必须满足此条件
+   - 计算方法：
+     * 做多：风险 = 当前价格 - 止损价格，收益 = 止盈价格 - 当前价格，风险回报比 = 收益 / 风险
+     * 做空：风险 = 止损价格 - 当前价格，收益 = 当前价格 - 止盈价格，风险回报比 = 收益 / 风险
+   - 示例（做多）：
+     * 当前价格：100 USDT
+     * 止损价格：95 USDT（风险 = 5 USDT）
+     * 止盈价格：115 USDT（收益 = 15 USDT）
+     * 风险回报比 = 15 / 5 = 3.0:1 ✓ 满足要求
+   - 示例（做空）：
+     * 当前价格：100 USDT
+     * 止损价格：105 USDT（风险 = 5 USDT）
+     * 止盈价格：85 USDT（收益 = 15 USDT）
+     * 风险回报比 = 15 / 5 = 3.0:1 ✓ 满足要求
+   - **重要**：设置止损和止盈时，必须确保风险回报比≥3.0，否则决策将被拒绝
+
+2. BTC/ETH 单币种仓位价值不能超过账户净值的10倍
+3. 山寨币单币种仓位价值不能超过账户净值的1.5倍
+4. 开仓操作必须提供完整的杠杆、仓位大小、止损、止盈参数
+5. 止损和止盈价格必须合理（做多时止损<止盈，做空时止损>止盈）
+
+请返回JSON数组格式的决策列表。
+"""
+
+
 class DecisionItem(BaseModel):
     """单个交易决策项"""
+    # 决策项只读；忽略模型多返回的字段，避免因额外字段整体校验失败
+    model_config = ConfigDict(frozen=True, extra='ignore')
+
     symbol: str = Field(description="币种符号（如BTC/USDT）")
     action: str = Field(description="操作类型：open_long/open_short/close_long/close_short/hold/wait")
     leverage: Optional[int] = Field(None, description="杠杆倍数（开仓时必填）")
@@ -27,9 +282,49 @@ class DecisionItem(BaseModel):
 
 class DecisionOutput(BaseModel):
     """AI决策输出（包含决策列表）"""
+    model_config = ConfigDict(frozen=True, extra='ignore')
+
     decisions: List[DecisionItem] = Field(description="交易决策列表")
 
 
+# 警报分组的展示顺序与标题
+_ALERT_SECTIONS = (
+    ('high', "【高优先级警报】"),
+    ('medium', "【中等优先级警报】"),
+    ('low', "【低优先级警报】"),
+)
+
+# 匹配被 ``` 或 ```json 代码块包裹的JSON（单次扫描）
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+
+# 结构化输出使用JSON Schema（而非Pydantic类），LLM返回普通dict，省去逐字段校验和 model_dump()
+# 数值字段由 _coerce_decision_numbers 统一转换，其余合法性由 Risk_check 节点校验
+_DECISION_OUTPUT_SCHEMA = DecisionOutput.model_json_schema()
+
+# 决策中的数值字段（LLM 可能以字符串形式返回，如 "5"）
+_DECISION_NUMBER_FIELDS = ('leverage', 'position_size_usd', 'stop_loss', 'take_profit', 'risk_usd', 'confidence')
+_DECISION_INT_FIELDS = frozenset({'leverage', 'confidence'})
+
+
+def _coerce_decision_numbers(decisions: list) -> list:
+    """把决策数值字段中的数字字符串转换为数值（与 DecisionItem 的Pydantic转换一致），原地修改
+
+    无法转换的值原样保留，由 Risk_check 判定为无效决策
+    """
+    for decision in decisions:
+        if not isinstance(decision, dict):
+            continue
+        for field in _DECISION_NUMBER_FIELDS:
+            value = decision.get(field)
+            if not isinstance(value, str):
+                continue
+            number = _to_float(value, None)
+            if number is None or isnan(number):
+                continue
+            decision[field] = int(number) if field in _DECISION_INT_FIELDS and number.is_integer() else number
+    return decisions
+
+
 class AIDecision:
     def __init__(
         self, 
@@ -50,6 +345,25 @@ class AIDecision:
         self.trader_id = trader_id
         self.llm = None  # 初始化为 None
         self.system_prompt = None
+        # 提示词静态部分只依赖杠杆配置，预先渲染
+        leverage_cfg = {
+            'btc_eth_leverage': self.trader_cfg.get('btc_eth_leverage', 5),
+            'altcoin_leverage': self.trader_cfg.get('altcoin_leverage', 5),
+        }
+        self._static_prompt_tail = _USER_PROMPT_TAIL_TMPL.format_map(leverage_cfg)
+        self._decision_rules = _DECISION_RULES_TMPL.format_map(leverage_cfg)
+        self._system_message = None
+        self._prompt_template = None
+        # K线摘要缓存：(symbol, 周期) -> (K线指纹, 摘要)，K线未变化时直接复用
+        self._kline_summary_cache: Dict[tuple, tuple] = {}
+        # 按币种分批并发调用LLM：每批最多 row_marshal_batch 个币种共用一个提示词，批次之间通过 batch 并发请求
+        # 币种数不超过批大小时仍使用单个完整提示词；默认0（关闭）：各批只能看到本批的持仓，
+        # 却都按全部账户净值开仓，合并后的总敞口没有整体约束，因此只作为显式开启的选项
+        ai_model_cfg = self.trader_cfg.get('ai_model', {})
+        self.row_marshal_batch = int(ai_model_cfg.get(
+            'row_marshal_batch', os.getenv("AI_ROW_MARSHAL_BATCH", "0")
+        ))
+        self.max_concurrency = int(ai_model_cfg.get('max_concurrency', os.getenv("AI_MAX_CONCURRENCY", "8")))
         
         # 初始化决策日志服务
         if settings:
@@ -57,7 +371,7 @@ class AIDecision:
                 from services.decision_log_service import DecisionLogService
                 self.decision_log_service = DecisionLogService(settings)
             except Exception as e:
-                logger.warning(f"⚠️ 初始化决策日志服务失败: {e}")
+                logger.warning("⚠️ 初始化决策日志服务失败: {}", e)
                 self.decision_log_service = None
         else:
             self.decision_log_service = None
@@ -69,7 +383,7 @@ class AIDecision:
         # 初始化 LLM
         try:
             provider = self.trader_cfg.get('ai_model', {}).get('provider', 'openai')
-            logger.debug(f"初始化LLM，Provider: {provider}")
+            logger.debug("初始化LLM，Provider: {}", provider)
             
             base_llm = self._get_llm(provider)
             if not base_llm:
@@ -77,21 +391,34 @@ class AIDecision:
                 self.llm = None
                 return
             
-            # 使用结构化输出
+            # 使用结构化输出（本地/自部署模型使用约束解码，输出必然符合schema）
             try:
-                self.llm = base_llm.with_structured_output(DecisionOutput)
-                logger.debug("已启用结构化输出")
+                method = LLMFactory.structured_output_method(self.trader_cfg.get('ai_model', {}))
+                if method:
+                    self.llm = base_llm.with_structured_output(_DECISION_OUTPUT_SCHEMA, method=method)
+                else:
+                    self.llm = base_llm.with_structured_output(_DECISION_OUTPUT_SCHEMA)
+                logger.debug("已启用结构化输出 (method: {})", method or 'default')
             except Exception as e:
-                logger.warning(f"启用结构化输出失败，将使用普通模式: {e}")
+                logger.warning("启用结构化输出失败，将使用普通模式: {}", e)
                 self.llm = base_llm
             
-            self.system_prompt = self.trader_cfg.get('prompt', '')
-            logger.info(f"AI Decision节点初始化完成 (prompt长度: {len(self.system_prompt)}字符)")
+            # 交易员自定义提示词 + 固定的决策规则
+            trader_prompt = self.trader_cfg.get('prompt', '')
+            self.system_prompt = f"{trader_prompt}\n\n{self._decision_rules}" if trader_prompt else self._decision_rules
+            # 系统提示词在交易员生命周期内不变，预先构建消息和模板，避免每次决策重复创建
+            # 直接传入 SystemMessage 对象，系统提示词中的花括号不会被当作模板变量解析
+            self._system_message = SystemMessage(content=self.system_prompt)
+            self._prompt_template = ChatPromptTemplate.from_messages([
+                self._system_message,
+                ("human", "{user_prompt}"),
+            ])
+            logger.info("AI Decision节点初始化完成 (prompt长度: {}字符)", len(self.system_prompt))
         except KeyError as e:
-            logger.error(f"初始化LLM失败 - KeyError: {e}", exc_info=True)
+            logger.error("初始化LLM失败 - KeyError: {}", e, exc_info=True)
             self.llm = None
         except Exception as e:
-            logger.error(f"初始化LLM失败: {e}", exc_info=True)
+            logger.error("初始化LLM失败: {}", e, exc_info=True)
             self.llm = None
 
 
@@ -110,19 +437,52 @@ class AIDecision:
             current_price = data.get('current_price')
             price_str = f"{current_price:.2f}" if current_price is not None else "N/A"
             
-            # 只显示当前价格，不包含完整K线原始数据
+            # 只显示当前价格和K线统计摘要，不包含完整K线原始数据
             # 序列数据已在 _format_signal_data() 中通过 _format_series_summary() 提供
             formatted_lines.append(f"  {symbol}: 当前价格 {price_str}")
+            for label, key in (("3分钟", 'klines_3m'), ("4小时", 'klines_4h')):
+                summary = self._get_kline_summary(symbol, key, data.get(key))
+                if summary:
+                    formatted_lines.append(f"    - {label}K线摘要: {summary}")
         
         return "\n".join(formatted_lines) if formatted_lines else "无市场数据"
 
+    def _get_kline_summary(self, symbol: str, key: str, klines: Optional[list]) -> Optional[str]:
+        """获取K线摘要（按K线指纹缓存，数据未变化时跳过重新计算）"""
+        if not klines:
+            return None
+        
+        # 最后一根K线在收盘前会持续更新（高低价、收盘价、成交量），所以指纹中包含其完整状态
+        fingerprint = (len(klines), klines[0].open_time, klines[-1].fingerprint())
+        cache_key = (symbol, key)
+        cached = self._kline_summary_cache.get(cache_key)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+        
+        summary = _summarize_klines(klines)
+        self._kline_summary_cache[cache_key] = (fingerprint, summary)
+        return summary
+
     def _format_signal_data(self, signal_data_map: dict) -> str:
         """格式化信号数据，提取关键指标并保留序列数据"""
         if not signal_data_map:
             return "无信号数据"
         
+        # 先把所有币种的趋势判断所需字段收集为数组，一次性向量化分类
+        signals_list = list(signal_data_map.values())
+        
+        def column(field: str) -> np.ndarray:
+            return np.fromiter(
+                (signals.get(field, 0) or 0 for signals in signals_list),
+                dtype=np.float64, count=len(signals_list)
+            )
+        
+        prices = column('current_price')
+        vs_ema_3m, macd_code_3m, rsi_code_3m = classify(prices, column('ema20_3m'), column('macd_3m'), column('rsi14_3m'))
+        vs_ema_4h, macd_code_4h, rsi_code_4h = classify(prices, column('ema20_4h'), column('macd_4h'), column('rsi14_4h'))
+        
         formatted_lines = []
-        for symbol, signals in signal_data_map.items():
+        for i, (symbol, signals) in enumerate(signal_data_map.items()):
             # 价格信息
             current_price = signals.get('current_price', 0)
             price_change_1h = signals.get('price_change_1h', 0)
@@ -157,13 +517,13 @@ class AIDecision:
             oi_avg_str = f"{open_interest_average:.2f}" if open_interest_average is not None else "N/A"
             funding_rate_str = f"{funding_rate:.2e}" if funding_rate is not None else "N/A"
             
-            # 趋势判断
-            price_vs_ema20_3m = "高于" if current_price > ema20_3m else "低于" if current_price < ema20_3m else "等于"
-            price_vs_ema20_4h = "高于" if current_price > ema20_4h else "低于" if current_price < ema20_4h else "等于"
-            macd_signal_3m = "看涨" if macd_3m > 0 else "看跌" if macd_3m < 0 else "中性"
-            macd_signal_4h = "看涨" if macd_4h > 0 else "看跌" if macd_4h < 0 else "中性"
-            rsi_status_3m = "超买" if rsi14_3m > 70 else "超卖" if rsi14_3m < 30 else "正常"
-            rsi_status_4h = "超买" if rsi14_4h > 70 else "超卖" if rsi14_4h < 30 else "正常"
+            # 趋势判断（状态码已在循环外统一计算）
+            price_vs_ema20_3m = PRICE_VS_EMA_TEXT[vs_ema_3m[i]]
+            price_vs_ema20_4h = PRICE_VS_EMA_TEXT[vs_ema_4h[i]]
+            macd_signal_3m = MACD_SIGNAL_TEXT[macd_code_3m[i]]
+            macd_signal_4h = MACD_SIGNAL_TEXT[macd_code_4h[i]]
+            rsi_status_3m = RSI_STATUS_TEXT[rsi_code_3m[i]]
+            rsi_status_4h = RSI_STATUS_TEXT[rsi_code_4h[i]]
             
             # 序列数据摘要（保留关键趋势信息）
             intraday_series = signals.get('intraday_series', {})
@@ -172,35 +532,36 @@ class AIDecision:
             intraday_summary = self._format_series_summary(intraday_series, "3分钟")
             longer_term_summary = self._format_series_summary(longer_term_series, "4小时")
             
-            formatted_lines.append(
-                f"  {symbol}:\n"
-                f"    【价格信息】\n"
-                f"      - 当前价格: {current_price:.2f}\n"
-                f"      - 1小时涨跌: {price_change_1h:+.2f}%\n"
-                f"      - 4小时涨跌: {price_change_4h:+.2f}%\n"
-                f"    【3分钟指标】\n"
-                f"      - EMA20: {ema20_3m:.2f} (价格{price_vs_ema20_3m}EMA20)\n"
-                f"      - MACD: {macd_3m:.2f} ({macd_signal_3m})\n"
-                f"      - RSI7: {rsi7_3m:.2f}\n"
-                f"      - RSI14: {rsi14_3m:.2f} ({rsi_status_3m})\n"
-                f"    【4小时指标】\n"
-                f"      - EMA20: {ema20_4h:.2f} (价格{price_vs_ema20_4h}EMA20)\n"
-                f"      - EMA50: {ema50_4h:.2f}\n"
-                f"      - MACD: {macd_4h:.2f} ({macd_signal_4h})\n"
-                f"      - RSI7: {rsi7_4h:.2f}\n"
-                f"      - RSI14: {rsi14_4h:.2f} ({rsi_status_4h})\n"
-                f"      - ATR14: {atr_4h:.2f} (波动率)\n"
-                f"      - ATR3: {atr3_4h:.2f} (短期波动率)\n"
-                f"    【成交量统计（4小时）】\n"
-                f"      - 当前成交量: {current_volume_4h:.2f}\n"
-                f"      - 平均成交量: {average_volume_4h:.2f}\n"
-                f"    【持仓量与资金费率】\n"
-                f"      - 持仓量 (Latest): {oi_str}\n"
-                f"      - 持仓量 (Average): {oi_avg_str}\n"
-                f"      - 资金费率: {funding_rate_str}\n"
-                f"    【3分钟序列数据摘要】\n{intraday_summary if intraday_summary else '        无数据'}\n"
-                f"    【4小时序列数据摘要】\n{longer_term_summary if longer_term_summary else '        无数据'}"
-            )
+            formatted_lines.append(_SIGNAL_TEMPLATE.format(
+                symbol=symbol,
+                current_price=current_price,
+                price_change_1h=price_change_1h,
+                price_change_4h=price_change_4h,
+                ema20_3m=ema20_3m,
+                price_vs_ema20_3m=price_vs_ema20_3m,
+                macd_3m=macd_3m,
+                macd_signal_3m=macd_signal_3m,
+                rsi7_3m=rsi7_3m,
+                rsi14_3m=rsi14_3m,
+                rsi_status_3m=rsi_status_3m,
+                ema20_4h=ema20_4h,
+                price_vs_ema20_4h=price_vs_ema20_4h,
+                ema50_4h=ema50_4h,
+                macd_4h=macd_4h,
+                macd_signal_4h=macd_signal_4h,
+                rsi7_4h=rsi7_4h,
+                rsi14_4h=rsi14_4h,
+                rsi_status_4h=rsi_status_4h,
+                atr_4h=atr_4h,
+                atr3_4h=atr3_4h,
+                current_volume_4h=current_volume_4h,
+                average_volume_4h=average_volume_4h,
+                oi_str=oi_str,
+                oi_avg_str=oi_avg_str,
+                funding_rate_str=funding_rate_str,
+                intraday_summary=intraday_summary if intraday_summary else '        无数据',
+                longer_term_summary=longer_term_summary if longer_term_summary else '        无数据',
+            ))
         
         return "\n".join(formatted_lines) if formatted_lines else "无信号数据"
 
@@ -218,27 +579,12 @@ class AIDecision:
         if not mid_prices:
             return ""
         
-        recent_prices = mid_prices[-10:] if len(mid_prices) > 10 else mid_prices
-        
-        def format_value(val: Any) -> str:
-            """格式化单个值，处理NaN和None"""
-            if val is None:
-                return 'N/A'
-            if isinstance(val, float) and (val != val):  # NaN check
-                return 'N/A'
-            return f'{val:.2f}'
-        
-        ema20_recent = [format_value(e) for e in (ema20_values[-10:] if ema20_values else [])]
-        macd_recent = [format_value(m) for m in (macd_values[-10:] if macd_values else [])]
-        rsi7_recent = [format_value(r) for r in (rsi7_values[-10:] if rsi7_values else [])]
-        rsi14_recent = [format_value(r) for r in (rsi14_values[-10:] if rsi14_values else [])]
-        
         return (
-            f"        最近价格序列: {[f'{p:.2f}' for p in recent_prices]}\n"
-            f"        最近EMA20序列: {ema20_recent}\n"
-            f"        最近MACD序列: {macd_recent}\n"
-            f"        最近RSI7序列: {rsi7_recent}\n"
-            f"        最近RSI14序列: {rsi14_recent}"
+            f"        最近价格序列: {_fmt_series(mid_prices)}\n"
+            f"        最近EMA20序列: {_fmt_series(ema20_values)}\n"
+            f"        最近MACD序列: {_fmt_series(macd_values)}\n"
+            f"        最近RSI7序列: {_fmt_series(rsi7_values)}\n"
+            f"        最近RSI14序列: {_fmt_series(rsi14_values)}"
         )
 
     def _format_account_info(self, account_info: dict) -> str:
@@ -362,242 +708,52 @@ class AIDecision:
         if not positions:
             return "无持仓"
         
-        formatted_lines = []
-        for pos in positions:
-            logger.debug(f"持仓信息-------------->: {pos}")
-            
-            # 提取基础字段（CCXT 标准化字段）
-            symbol = pos.get('symbol', 'N/A')
-            side = pos.get('side', 'N/A')
-            
-            # 提取持仓数量（使用 contracts 字段）
-            size = pos.get('contracts')
-            if size is None:
-                # 如果 contracts 不存在，尝试从 info.position.szi 获取
-                info_pos = pos.get('info', {}).get('position', {})
-                if info_pos:
-                    szi = info_pos.get('szi')
-                    if szi is not None:
-                        try:
-                            size = float(szi)
-                        except (ValueError, TypeError):
-                            size = 0.0
-                    else:
-                        size = 0.0
-                else:
-                    size = 0.0
-            else:
-                try:
-                    size = float(size)
-                except (ValueError, TypeError):
-                    size = 0.0
-            
-            # 提取开仓价（使用 entryPrice 字段）
-            entry_price = pos.get('entryPrice')
-            if entry_price is None:
-                # 如果 entryPrice 不存在，尝试从 info.position.entryPx 获取
-                info_pos = pos.get('info', {}).get('position', {})
-                if info_pos:
-                    entry_px = info_pos.get('entryPx')
-                    if entry_px is not None:
-                        try:
-                            entry_price = float(entry_px)
-                        except (ValueError, TypeError):
-                            entry_price = 0.0
-                    else:
-                        entry_price = 0.0
-                else:
-                    entry_price = 0.0
-            else:
-                try:
-                    entry_price = float(entry_price)
-                except (ValueError, TypeError):
-                    entry_price = 0.0
-            
-            # 提取标记价（可能为 None）
-            mark_price = pos.get('markPrice')
-            if mark_price is None:
-                mark_price_str = "N/A"
-            else:
-                try:
-                    mark_price_float = float(mark_price)
-                    mark_price_str = f"{mark_price_float:.2f}"
-                except (ValueError, TypeError):
-                    mark_price_str = "N/A"
-            
-            # 提取未实现盈亏（使用 unrealizedPnl 字段）
-            unrealized_pnl = pos.get('unrealizedPnl')
-            if unrealized_pnl is None:
-                # 如果 unrealizedPnl 不存在，尝试从 info.position.unrealizedPnl 获取
-                info_pos = pos.get('info', {}).get('position', {})
-                if info_pos:
-                    unrealized = info_pos.get('unrealizedPnl')
-                    if unrealized is not None:
-                        try:
-                            unrealized_pnl = float(unrealized)
-                        except (ValueError, TypeError):
-                            unrealized_pnl = 0.0
-                    else:
-                        unrealized_pnl = 0.0
-                else:
-                    unrealized_pnl = 0.0
-            else:
-                try:
-                    unrealized_pnl = float(unrealized_pnl)
-                except (ValueError, TypeError):
-                    unrealized_pnl = 0.0
-            
-            # 提取杠杆（使用 leverage 字段，已经是数字）
-            leverage = pos.get('leverage')
-            if leverage is None:
-                # 如果 leverage 不存在，尝试从 info.position.leverage.value 获取
-                info_pos = pos.get('info', {}).get('position', {})
-                if info_pos:
-                    leverage_dict = info_pos.get('leverage', {})
-                    if isinstance(leverage_dict, dict):
-                        leverage = leverage_dict.get('value')
-                    else:
-                        leverage = 1
-                else:
-                    leverage = 1
-            
-            if leverage is not None:
-                try:
-                    leverage = int(float(leverage))
-                except (ValueError, TypeError):
-                    leverage = 1
-            else:
-                leverage = 1
-            
-            # 提取清算价格（使用 liquidationPrice 字段）
-            liquidation_price = pos.get('liquidationPrice')
-            if liquidation_price is None:
-                # 如果 liquidationPrice 不存在，尝试从 info.position.liquidationPx 获取
-                info_pos = pos.get('info', {}).get('position', {})
-                if info_pos:
-                    liquidation_px = info_pos.get('liquidationPx')
-                    if liquidation_px is not None:
-                        try:
-                            liquidation_price = float(liquidation_px)
-                        except (ValueError, TypeError):
-                            liquidation_price = None
-                    else:
-                        liquidation_price = None
-                else:
-                    liquidation_price = None
-            
-            liquidation_price_str = "N/A"
-            if liquidation_price is not None:
-                try:
-                    liquidation_price_float = float(liquidation_price)
-                    liquidation_price_str = f"{liquidation_price_float:.2f}"
-                except (ValueError, TypeError):
-                    liquidation_price_str = "N/A"
-            
-            # 提取已用保证金（使用 collateral 字段）
-            margin_used = pos.get('collateral')
-            if margin_used is None:
-                # 如果 collateral 不存在，尝试从 info.position.marginUsed 获取
-                info_pos = pos.get('info', {}).get('position', {})
-                if info_pos:
-                    margin_used_str = info_pos.get('marginUsed')
-                    if margin_used_str is not None:
-                        try:
-                            margin_used = float(margin_used_str)
-                        except (ValueError, TypeError):
-                            margin_used = None
-                    else:
-                        margin_used = None
-                else:
-                    margin_used = None
-            
-            margin_used_str = "N/A"
-            if margin_used is not None:
-                try:
-                    margin_used_float = float(margin_used)
-                    margin_used_str = f"{margin_used_float:.2f}"
-                except (ValueError, TypeError):
-                    margin_used_str = "N/A"
-            
-            # 提取持仓名义价值（使用 notional 字段）
-            position_value = pos.get('notional')
-            if position_value is None:
-                # 如果 notional 不存在，尝试从 info.position.positionValue 获取
-                info_pos = pos.get('info', {}).get('position', {})
-                if info_pos:
-                    pos_value = info_pos.get('positionValue')
-                    if pos_value is not None:
-                        try:
-                            position_value = float(pos_value)
-                        except (ValueError, TypeError):
-                            position_value = None
-                    else:
-                        position_value = None
-                else:
-                    position_value = None
-            
-            # 提取保证金模式
-            margin_mode = pos.get('marginMode', 'N/A')
-            if margin_mode == 'cross':
-                margin_mode_str = '全仓'
-            elif margin_mode == 'isolated':
-                margin_mode_str = '逐仓'
-            else:
-                margin_mode_str = str(margin_mode)
-            
-            # 提取盈亏百分比（使用 percentage 字段，如果存在）
-            pnl_percent = pos.get('percentage')
-            if pnl_percent is None:
-                # 如果 percentage 不存在，尝试从 info.position.returnOnEquity 获取
-                info_pos = pos.get('info', {}).get('position', {})
-                if info_pos:
-                    roe = info_pos.get('returnOnEquity')
-                    if roe is not None:
-                        try:
-                            pnl_percent = float(roe) * 100  # returnOnEquity 是小数，需要乘以100
-                        except (ValueError, TypeError):
-                            # 如果计算失败，使用 entry_price 和 size 计算
-                            if entry_price and size and entry_price * size > 0:
-                                pnl_percent = (unrealized_pnl / (entry_price * size)) * 100
-                            else:
-                                pnl_percent = 0.0
-                    else:
-                        # 使用 entry_price 和 size 计算
-                        if entry_price and size and entry_price * size > 0:
-                            pnl_percent = (unrealized_pnl / (entry_price * size)) * 100
-                        else:
-                            pnl_percent = 0.0
-                else:
-                    # 使用 entry_price 和 size 计算
-                    if entry_price and size and entry_price * size > 0:
-                        pnl_percent = (unrealized_pnl / (entry_price * size)) * 100
-                    else:
-                        pnl_percent = 0.0
-            else:
-                try:
-                    pnl_percent = float(pnl_percent)
-                except (ValueError, TypeError):
-                    pnl_percent = 0.0
-            
-            pnl_status = "盈利" if unrealized_pnl > 0 else "亏损" if unrealized_pnl < 0 else "持平"
-            
-            # 格式化输出
-            formatted_lines.append(
-                f"  {symbol}:\n"
-                f"    - 方向: {side}\n"
-                f"    - 数量: {size:.4f}\n"
-                f"    - 杠杆: {leverage}x\n"
-                f"    - 保证金模式: {margin_mode_str}\n"
-                f"    - 开仓价: {entry_price:.2f}\n"
-                f"    - 标记价: {mark_price_str}\n"
-                f"    - 持仓价值: {position_value:.2f} USDT\n" if position_value is not None else ""
-                f"    - 未实现盈亏: {unrealized_pnl:+.2f} USDT ({pnl_percent:+.2f}%) [{pnl_status}]\n"
-                f"    - 清算价格: {liquidation_price_str}\n"
-                f"    - 已用保证金: {margin_used_str} USDT"
-            )
+        # CCXT 标准化字段缺失时回退到 info.position 下的交易所原始字段
+        info_positions = [(pos.get('info') or {}).get('position') or {} for pos in positions]
         
-        logger.debug(f"formatted_lines-------------->: {formatted_lines}")
-        return "\n".join(formatted_lines) if formatted_lines else "无持仓"
+        def column(key: str, info_key: Optional[str], missing: float) -> np.ndarray:
+            """按列提取数值字段：字段缺失返回 missing，无法转换为数字时同样返回 missing"""
+            values = []
+            for pos, info_pos in zip(positions, info_positions):
+                raw = pos.get(key)
+                if raw is None and info_key:
+                    raw = info_pos.get(info_key)
+                values.append(_to_float(raw, missing))
+            return np.array(values, dtype=np.float64)
+        
+        size_arr = column('contracts', 'szi', 0.0)
+        entry_arr = column('entryPrice', 'entryPx', 0.0)
+        mark_arr = column('markPrice', None, np.nan)
+        pnl_arr = column('unrealizedPnl', 'unrealizedPnl', 0.0)
+        liq_arr = column('liquidationPrice', 'liquidationPx', np.nan)
+        margin_arr = column('collateral', 'marginUsed', np.nan)
+        value_arr = column('notional', 'positionValue', np.nan)
+        roe_arr = column('returnOnEquity', 'returnOnEquity', np.nan)
+        
+        # percentage 字段存在但无法转换时按 0 处理，不存在时才回退
+        pct_arr = np.array(
+            [np.nan if pos.get('percentage') is None else _to_float(pos.get('percentage'), 0.0) for pos in positions],
+            dtype=np.float64
+        )
+        
+        # 盈亏百分比：percentage -> returnOnEquity(小数, ×100) -> 未实现盈亏 / 名义价值
+        notional_arr = entry_arr * size_arr
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fallback_pct = np.where(notional_arr > 0, 100.0 * pnl_arr / notional_arr, 0.0)
+        pnl_pct_arr = np.where(~np.isnan(pct_arr), pct_arr, np.where(~np.isnan(roe_arr), roe_arr * 100, fallback_pct))
+        
+        logger.debug("持仓信息-------------->: {}", positions)
+        
+        # 循环外一次性转换为 Python 列表，避免循环内逐个访问 NumPy 标量
+        rows = zip(
+            positions, info_positions,
+            size_arr.tolist(), entry_arr.tolist(), mark_arr.tolist(), pnl_arr.tolist(),
+            liq_arr.tolist(), margin_arr.tolist(), value_arr.tolist(), pnl_pct_arr.tolist(),
+        )
+        
+        formatted = "\n".join(map(_fmt_position, rows))
+        logger.debug("持仓格式化结果-------------->: {}", formatted)
+        return formatted or "无持仓"
     
     def _format_candidate_coins(self, coins: list, coin_sources: dict) -> str:
         """格式化候选币种及其来源"""
@@ -676,31 +832,22 @@ class AIDecision:
         if not alerts:
             return "无市场警报"
         
-        # 按严重程度分组
-        high_alerts = [a for a in alerts if a.get('severity') == 'high']
-        medium_alerts = [a for a in alerts if a.get('severity') == 'medium']
-        low_alerts = [a for a in alerts if a.get('severity') == 'low']
+        # 单次遍历按严重程度分桶；未知严重程度与原逻辑一致，不展示
+        buckets = {'high': [], 'medium': [], 'low': []}
+        for alert in alerts:
+            bucket = buckets.get(alert.get('severity'))
+            if bucket is not None:
+                bucket.append(f"  - {alert.get('message', 'N/A')}")
         
         lines = []
-        
-        if high_alerts:
-            lines.append("【高优先级警报】")
-            for alert in high_alerts:
-                lines.append(f"  ⚠️ {alert.get('message', 'N/A')}")
-        
-        if medium_alerts:
-            if lines:
-                lines.append("")
-            lines.append("【中等优先级警报】")
-            for alert in medium_alerts:
-                lines.append(f"  ⚠️ {alert.get('message', 'N/A')}")
-        
-        if low_alerts:
+        for severity, title in _ALERT_SECTIONS:
+            messages = buckets[severity]
+            if not messages:
+                continue
             if lines:
                 lines.append("")
-            lines.append("【低优先级警报】")
-            for alert in low_alerts:
-                lines.append(f"  ℹ️ {alert.get('message', 'N/A')}")
+            lines.append(title)
+            lines.extend(messages)
         
         return "\n".join(lines) if lines else "无市场警报"
 
@@ -719,16 +866,12 @@ class AIDecision:
         # 获取当前持仓（从state获取）
         positions = state.get('positions', [])
         if positions:
-            logger.info(f"当前持仓: {len(positions)}个")
+            logger.info("当前持仓: {}个", len(positions))
 
-        # 获取杠杆配置
-        btc_eth_leverage = self.trader_cfg.get('btc_eth_leverage', 5)
-        altcoin_leverage = self.trader_cfg.get('altcoin_leverage', 5)
-        
         # 获取运行状态信息
         runtime_minutes = state.get('runtime_minutes', 0)
         call_count = state.get('call_count', 0)
-        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        current_time = state.get('tick_time_str') or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
         # 格式化各部分信息
         account_info_str = self._format_account_info(account_balance)
@@ -740,187 +883,205 @@ class AIDecision:
         candidate_coins_info = self._format_candidate_coins(coins, coin_sources)
         oi_top_info = self._format_oi_top_data(oi_top_data_map)
         
-        user_prompt = f"""
-# 交易决策分析请求
-
-## 一、运行状态
-- 当前时间: {current_time}
-- 运行时长: {runtime_minutes} 分钟
-- 调用次数: {call_count}
-
-## 二、账户信息
-{account_info_str}
-- 当前持仓数量: {len(positions)} 个
-
-## 三、性能分析
-{performance_info}
-
-## 四、持仓详情
-{positions_info}
-
-## 五、候选币种及来源
-{candidate_coins_info}
-
-## 六、OI Top 数据（持仓量增长Top币种）
-{oi_top_info}
-
-## 七、市场警报
-{alerts_info}
-
-## 八、市场数据与技术指标
-{market_info}
-
-{signal_info}
-
-## 九、交易配置
-- BTC/ETH 杠杆上限: {btc_eth_leverage}x
-- 山寨币杠杆上限: {altcoin_leverage}x
-
-## 十、决策要求
-请根据以上信息，对每个候选币种和现有持仓进行综合分析，并给出交易决策：
-
-### 对于候选币种（开仓决策）：
-1. 分析K线数据，识别价格趋势和形态
-2. 结合3分钟和4小时指标，评估多时间框架信号
-3. 观察序列数据的变化趋势
-4. 参考 OI Top 数据（如果可用），评估持仓量变化
-5. 考虑账户余额和现有持仓情况
-6. 给出明确的交易建议：开多、开空或等待
+        user_prompt = _USER_PROMPT_HEAD_TMPL.format_map({
+            'current_time': current_time,
+            'runtime_minutes': runtime_minutes,
+            'call_count': call_count,
+            'account_info_str': account_info_str,
+            'positions_count': len(positions),
+            'performance_info': performance_info,
+            'positions_info': positions_info,
+            'candidate_coins_info': candidate_coins_info,
+            'oi_top_info': oi_top_info,
+            'alerts_info': alerts_info,
+            'market_info': market_info,
+            'signal_info': signal_info,
+        }) + self._static_prompt_tail
+        logger.debug("构建用户提示词完成 (持仓: {}, 币种: {})", len(positions), len(coins))
+        return user_prompt
 
-### 对于现有持仓（平仓决策）：
-1. 评估持仓的盈亏情况
-2. 分析当前市场信号是否支持继续持有
-3. 考虑清算价格风险
-4. 给出明确的交易建议：平多、平空或持有
+    def _build_messages(self, state: DecisionState) -> list:
+        """构建发送给LLM的消息列表"""
+        user_prompt = self._build_user_prompt(state)
+        logger.debug("用户提示词构建完成，长度: {}字符", len(user_prompt))
+        logger.debug("用户提示词: {}", user_prompt)
+        if self._prompt_template is not None:
+            return self._prompt_template.format_messages(user_prompt=user_prompt)
+        return [
+            SystemMessage(content=self.system_prompt or ''),
+            HumanMessage(content=user_prompt),
+        ]
 
-### 决策格式要求：
-请以结构化的JSON数组格式返回决策结果，每个决策包含：
-- symbol: 币种符号（如 "BTC/USDT"）
-- action: 操作类型，必须是以下之一：
-  - "open_long": 开多仓
-  - "open_short": 开空仓
-  - "close_long": 平多仓
-  - "close_short": 平空仓
-  - "hold": 持有（对现有持仓）
-  - "wait": 等待（对候选币种，暂不开仓）
-- leverage: 杠杆倍数（开仓时必填，1-{altcoin_leverage}，BTC/ETH最高{btc_eth_leverage}）
-- position_size_usd: 仓位大小（USD，开仓时必填）
-- stop_loss: 止损价格（开仓时必填，必须>0）
-- take_profit: 止盈价格（开仓时必填，必须>0）
-- confidence: 信心度 (0-100)
-- risk_usd: 最大美元风险（开仓时必填）
-- reasoning: 决策理由（需引用具体的K线形态、指标信号、OI Top数据等）
+    def _split_state(self, state: DecisionState) -> List[DecisionState]:
+        """按币种分批拆分state，每个子state只包含该批币种的市场/信号/持仓/警报数据（账户、性能等全局信息保留）
+        
+        币种数不超过批大小（或未开启分批）时返回空列表，表示使用单个完整提示词
+        """
+        batch_size = self.row_marshal_batch
+        if batch_size <= 0:
+            return []
+        
+        candidates = state.get('candidate_symbols', []) or []
+        positions = state.get('positions', []) or []
+        alerts = state.get('alerts') or []
+        
+        # 候选币种 + 持仓币种（去重并保持顺序）
+        symbols = list(dict.fromkeys(
+            list(candidates) + [pos.get('symbol') for pos in positions if pos.get('symbol')]
+        ))
+        if len(symbols) <= batch_size:
+            return []
+        
+        sub_states = []
+        for i in range(0, len(symbols), batch_size):
+            chunk = symbols[i:i + batch_size]
+            chunk_set = set(chunk)
+            sub_state = dict(state)
+            sub_state['candidate_symbols'] = [s for s in candidates if s in chunk_set]
+            sub_state['positions'] = [pos for pos in positions if pos.get('symbol') in chunk_set]
+            sub_state['alerts'] = [a for a in alerts if a.get('symbol') in chunk_set]
+            for key in ('market_data_map', 'signal_data_map', 'oi_top_data_map'):
+                data_map = state.get(key) or {}
+                sub_state[key] = {s: data_map[s] for s in chunk if s in data_map}
+            sub_states.append(sub_state)
+        return sub_states
 
-### 重要约束：
-1. **风险回报比必须≥3:1（收益/风险 ≥ 3）**
-   - 这是硬性要求，所有开仓决策必须满足此条件
-   - 计算方法：
-     * 做多：风险 = 当前价格 - 止损价格，收益 = 止盈价格 - 当前价格，风险回报比 = 收益 / 风险
-     * 做空：风险 = 止损价格 - 当前价格，收益 = 当前价格 - 止盈价格，风险回报比 = 收益 / 风险
-   - 示例（做多）：
-     * 当前价格：100 USDT
-     * 止损价格：95 USDT（风险 = 5 USDT）
-     * 止盈价格：115 USDT（收益 = 15 USDT）
-     * 风险回报比 = 15 / 5 = 3.0:1 ✓ 满足要求
-   - 示例（做空）：
-     * 当前价格：100 USDT
-     * 止损价格：105 USDT（风险 = 5 USDT）
-     * 止盈价格：85 USDT（收益 = 15 USDT）
-     * 风险回报比 = 15 / 5 = 3.0:1 ✓ 满足要求
-   - **重要**：设置止损和止盈时，必须确保风险回报比≥3.0，否则决策将被拒绝
+    def _merge_batch_responses(self, responses: list, state: DecisionState) -> DecisionState:
+        """合并按币种并发调用的LLM响应"""
+        decisions = []
+        errors = []
+        for response in responses:
+            if isinstance(response, Exception):
+                logger.error("分批AI决策失败: {}", response)
+                errors.append(str(response))
+                continue
+            result = self._handle_response(response, {}).get('ai_decision', {})
+            if 'error' in result:
+                errors.append(result['error'])
+            decisions.extend(result.get('decisions', []))
+        
+        logger.info("AI决策完成（分批并发），共{}个决策", len(decisions))
+        state['ai_decision'] = {
+            'decisions': decisions,
+            'raw_response': None
+        }
+        if errors:
+            state['ai_decision']['errors'] = errors
+        return state
 
-2. BTC/ETH 单币种仓位价值不能超过账户净值的10倍
-3. 山寨币单币种仓位价值不能超过账户净值的1.5倍
-4. 开仓操作必须提供完整的杠杆、仓位大小、止损、止盈参数
-5. 止损和止盈价格必须合理（做多时止损<止盈，做空时止损>止盈）
+    def _handle_response(self, response, state: DecisionState) -> DecisionState:
+        """解析LLM响应并写入state"""
+        # 结构化输出（JSON Schema）：直接得到 {'decisions': [...]} 字典
+        if isinstance(response, dict) and 'decisions' in response:
+            decisions = _coerce_decision_numbers(response.get('decisions') or [])
+            logger.info("AI决策完成，共{}个决策", len(decisions))
+            state['ai_decision'] = {
+                'decisions': decisions,
+                'raw_response': None  # 结构化输出不包含原始响应
+            }
+        # 兼容返回DecisionOutput对象的情况
+        elif isinstance(response, DecisionOutput):
+            # 整体 model_dump() 一次，由 pydantic-core 批量序列化，而非逐项调用
+            decisions = response.model_dump()['decisions']
+            
+            decision_count = len(decisions)
+            logger.info("AI决策完成，共{}个决策", decision_count)
+            state['ai_decision'] = {
+                'decisions': decisions,
+                'raw_response': None  # 结构化输出不包含原始响应
+            }
+            
+            # 注意：决策日志保存已移至 Risk_check 节点之后
+        else:
+            # 回退到手动解析（如果结构化输出未启用）
+            logger.warning("收到非结构化响应，尝试手动解析")
+            if hasattr(response, 'content'):
+                response_text = response.content
+                # 提取JSON（如果被代码块包裹）
+                match = _FENCE_RE.search(response_text)
+                if match:
+                    response_text = match.group(1).strip()
+                
+                try:
+                    decisions = _json_loads(response_text)
+                    decision_count = len(decisions) if isinstance(decisions, list) else 1
+                    logger.info("AI决策完成，共{}个决策", decision_count)
+                    decisions_list = _coerce_decision_numbers(decisions if isinstance(decisions, list) else [decisions])
+                    state['ai_decision'] = {
+                        'decisions': decisions_list,
+                        'raw_response': response.content
+                    }
+                    
+                    # 注意：决策日志保存已移至 Risk_check 节点之后
+                except json.JSONDecodeError as e:
+                    logger.error("JSON解析失败: {}", e)
+                    state['ai_decision'] = {
+                        'error': f"JSON解析失败: {str(e)}",
+                        'raw_response': response.content
+                    }
+            else:
+                logger.error("无法解析响应格式")
+                state['ai_decision'] = {
+                    'error': "无法解析响应格式",
+                    'raw_response': str(response)
+                }
+        
+        return state
 
-请返回JSON数组格式的决策列表。
-"""
-        logger.debug(f"构建用户提示词完成 (持仓: {len(positions)}, 币种: {len(coins)})")
-        return user_prompt
+    def _skip_idle_tick(self, state: DecisionState) -> bool:
+        """没有候选币种且没有持仓时不可能产生决策，直接写入空决策，省去构建提示词和一次LLM调用"""
+        if state.get('candidate_symbols') or state.get('positions'):
+            return False
+        logger.info("无候选币种且无持仓，跳过本轮AI决策")
+        state['ai_decision'] = {
+            'decisions': [],
+            'raw_response': None
+        }
+        return True
 
     def run(self, state: DecisionState) -> DecisionState:
         """执行AI决策"""
-        logger.info(f"AI决策节点执行，LLM: {self.llm}")
+        logger.info("AI决策节点执行，LLM: {}", self.llm)
         if not hasattr(self, 'llm') or self.llm is None:
             logger.error("LLM未初始化，AI模型可能未启用或初始化失败")
             return state
         
+        if self._skip_idle_tick(state):
+            return state
+        
+        # 本轮决策时间只格式化一次，分批构建的多个提示词共享
+        if not state.get('tick_time_str'):
+            state['tick_time_str'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        
         try:
-            user_prompt = self._build_user_prompt(state)
-            logger.debug(f"用户提示词构建完成，长度: {len(user_prompt)}字符")
-            
-            messages = [
-                SystemMessage(content=self.system_prompt),
-                HumanMessage(content=user_prompt),
-            ]
+            sub_states = self._split_state(state)
+            if sub_states:
+                batch_messages = [self._build_messages(sub_state) for sub_state in sub_states]
+                logger.info(
+                    "按币种分批并发调用LLM进行决策 ({}批, 每批最多{}个币种)...",
+                    len(batch_messages), self.row_marshal_batch
+                )
+                start = time.monotonic()
+                responses = self.llm.batch(
+                    batch_messages,
+                    config={"max_concurrency": self.max_concurrency},
+                    return_exceptions=True
+                )
+                # 记录批大小与耗时，便于按实际延迟调整 row_marshal_batch
+                logger.info(
+                    "分批LLM调用耗时: {:.2f}s (批大小: {}, 批数: {})",
+                    time.monotonic() - start, self.row_marshal_batch, len(batch_messages)
+                )
+                return self._merge_batch_responses(responses, state)
             
+            messages = self._build_messages(state)
             logger.info("调用LLM进行决策...")
-            logger.debug(f"用户提示词: {user_prompt}")
             response = self.llm.invoke(messages)
-            
-            # 使用结构化输出，直接获取DecisionOutput对象
-            if isinstance(response, DecisionOutput):
-                # 使用model_dump()（Pydantic v2）或dict()（Pydantic v1）
-                try:
-                    decisions = [item.model_dump() for item in response.decisions]
-                except AttributeError:
-                    # 回退到dict()方法（Pydantic v1）
-                    decisions = [item.dict() for item in response.decisions]
-                
-                decision_count = len(decisions)
-                logger.info(f"AI决策完成，共{decision_count}个决策")
-                state['ai_decision'] = {
-                    'decisions': decisions,
-                    'raw_response': None  # 结构化输出不包含原始响应
-                }
-                
-                # 注意：决策日志保存已移至 Risk_check 节点之后
-            else:
-                # 回退到手动解析（如果结构化输出未启用）
-                logger.warning("收到非结构化响应，尝试手动解析")
-                if hasattr(response, 'content'):
-                    import json
-                    response_text = response.content
-                    # 提取JSON（如果被代码块包裹）
-                    if '```json' in response_text:
-                        json_start = response_text.find('```json') + 7
-                        json_end = response_text.find('```', json_start)
-                        response_text = response_text[json_start:json_end].strip()
-                    elif '```' in response_text:
-                        json_start = response_text.find('```') + 3
-                        json_end = response_text.find('```', json_start)
-                        response_text = response_text[json_start:json_end].strip()
-                    
-                    try:
-                        decisions = json.loads(response_text)
-                        decision_count = len(decisions) if isinstance(decisions, list) else 1
-                        logger.info(f"AI决策完成，共{decision_count}个决策")
-                        decisions_list = decisions if isinstance(decisions, list) else [decisions]
-                        state['ai_decision'] = {
-                            'decisions': decisions_list,
-                            'raw_response': response.content
-                        }
-                        
-                        # 注意：决策日志保存已移至 Risk_check 节点之后
-                    except json.JSONDecodeError as e:
-                        logger.error(f"JSON解析失败: {e}")
-                        state['ai_decision'] = {
-                            'error': f"JSON解析失败: {str(e)}",
-                            'raw_response': response.content
-                        }
-                else:
-                    logger.error("无法解析响应格式")
-                    state['ai_decision'] = {
-                        'error': "无法解析响应格式",
-                        'raw_response': str(response)
-                    }
-            
-            return state
+            return self._handle_response(response, state)
         except Exception as e:
-            logger.error(f"AI决策执行失败: {e}", exc_info=True)
+            logger.error("AI决策执行失败: {}", e, exc_info=True)
             return state
-    
+
     def _save_decision_logs(self, decisions: List[Dict], state: DecisionState):
         """保存决策日志到数据库"""
         if not self.decision_log_service or not self.trader_id:
@@ -938,35 +1099,23 @@ class AIDecision:
             'runtime_minutes': state.get('runtime_minutes'),
         }
         
-        # 为每个决策保存日志
+        # 收集决策，交给后台线程批量写入（不阻塞决策流程）
+        log_entries = []
         for decision in decisions:
-            try:
-                symbol = decision.get('symbol', '')
-                action = decision.get('action', '')
-                reasoning = decision.get('reasoning', '')
-                confidence = decision.get('confidence')
-                
-                if not symbol:
-                    logger.warning("⚠️ 决策缺少 symbol，跳过保存")
-                    continue
-                
-                # 转换置信度
-                confidence_decimal = None
-                if confidence is not None:
-                    try:
-                        confidence_decimal = Decimal(str(confidence))
-                    except Exception as e:
-                        logger.warning(f"⚠️ 转换置信度失败: {e}")
-                
-                # 保存决策日志
-                self.decision_log_service.record_decision(
-                    trader_id=self.trader_id,
-                    symbol=symbol,
-                    decision_state=state_snapshot,
-                    decision_result=action,
-                    reasoning=reasoning,
-                    confidence=confidence_decimal
-                )
-            except Exception as e:
-                logger.warning(f"⚠️ 保存决策日志失败: {symbol} - {e}", exc_info=True)
-                # 继续处理其他决策，不中断流程
\ No newline at end of file
+            symbol = decision.get('symbol', '')
+            if not symbol:
+                logger.warning("⚠️ 决策缺少 symbol，跳过保存")
+                continue
+            log_entries.append({
+                'symbol': symbol,
+                'decision_result': decision.get('action', ''),
+                'reasoning': decision.get('reasoning', ''),
+                'confidence': decision.get('confidence'),
+            })
+        
+        if log_entries:
+            self.decision_log_service.record_decisions_async(
+                trader_id=self.trader_id,
+                decisions=log_entries,
+                decision_state=state_snapshot
+            )
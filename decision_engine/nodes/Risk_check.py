@@ -1,13 +1,28 @@
+import sys
+import numpy as np
 from decision_engine.state import DecisionState
+from functools import lru_cache
 from typing import Optional, List, Dict, Tuple, TYPE_CHECKING
 from utils.logger import logger
-from decimal import Decimal
+from utils._risk_njit import rrr_kernel
 
 if TYPE_CHECKING:
     from config.settings import Settings
     from services.decision_log_service import DecisionLogService
 
 
+def _as_number(value) -> float:
+    """数值字段转 float；None 或非数值类型返回 NaN（保持逐条验证中的原始比较语义）"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    return np.nan
+
+
+def _is_number(value) -> bool:
+    """是否为可参与比较的数值（int/float 且非 NaN）"""
+    return isinstance(value, (int, float)) and value == value
+
+
 class RiskCheck:
     """检查风险，包括AI决策是否安全"""
     
@@ -18,7 +33,19 @@ class RiskCheck:
     MAX_POSITION_VALUE_ALTCOIN_MULTIPLIER = 1.5  # 山寨币最多1.5倍账户净值
     
     # 有效action列表
-    VALID_ACTIONS = {"open_long", "open_short", "close_long", "close_short", "hold", "wait"}
+    OPEN_ACTIONS = frozenset({"open_long", "open_short"})
+    CLOSE_ACTIONS = frozenset({"close_long", "close_short"})
+    HOLD_WAIT_ACTIONS = frozenset({"hold", "wait"})
+    VALID_ACTIONS = OPEN_ACTIONS | CLOSE_ACTIONS | HOLD_WAIT_ACTIONS
+    
+    # 适用BTC/ETH风控上限的基础币种
+    BTC_ETH_BASES = frozenset({'BTC', 'ETH'})
+    
+    # 开仓决策中必须为数值的字段（None 表示未提供，由各项校验分别处理）
+    OPEN_NUMBER_FIELDS = ('leverage', 'position_size_usd', 'stop_loss', 'take_profit', 'risk_usd')
+    
+    # 市场数据中当前价格的候选字段（按优先级）
+    PRICE_KEYS = ('current_price', 'price', 'last_price', 'close')
     
     def __init__(
         self, 
@@ -42,6 +69,13 @@ class RiskCheck:
         self.btc_eth_leverage = trader_cfg.get('btc_eth_leverage', 5)
         self.altcoin_leverage = trader_cfg.get('altcoin_leverage', 5)
         
+        # 预先组合 (最大杠杆, 仓位价值倍数上限)，验证时按币种类别直接取用
+        self._btc_eth_limits = (self.btc_eth_leverage, self.MAX_POSITION_VALUE_BTC_ETH_MULTIPLIER)
+        self._altcoin_limits = (self.altcoin_leverage, self.MAX_POSITION_VALUE_ALTCOIN_MULTIPLIER)
+        
+        # 同一部署中市场数据的价格字段固定，首次命中后记住，之后直接读取
+        self._price_key: Optional[str] = None
+        
         # 从trader_cfg获取系统级风险配置（来自system_config表，已在trader_manager中加载）
         self.max_daily_loss = trader_cfg.get('max_daily_loss', 10.0)
         self.max_drawdown = trader_cfg.get('max_drawdown', 20.0)
@@ -81,18 +115,31 @@ class RiskCheck:
             logger.warning("⚠️ AI决策格式错误，跳过风险检查")
             return state
         
-
-        
-        total_equity = state.get('account_balance', {}).get('total_equity', 0)
+        # 2. 获取账户净值与保证金使用率（只取用到的两个标量）
+        total_equity, margin_used_pct = self._get_account_scalars(state)
         
         # 3. 获取持仓和市场数据
         positions = state.get('positions', [])
         market_data_map = state.get('market_data_map', {})
+        # 按symbol索引持仓（与逐个查找一致：同一symbol取第一个）
+        positions_by_symbol: Dict[str, Dict] = {}
+        for pos in positions:
+            symbol = pos.get('symbol')
+            if symbol and symbol not in positions_by_symbol:
+                positions_by_symbol[symbol] = pos
         
         # 4. 验证每个决策
         validated_decisions: List[Dict] = []
         validation_errors: List[Dict] = []
         
+        # LLM返回的符号是新建字符串，驻留后与持仓/行情字典中（同样驻留的）键比较可按地址短路
+        for decision_dict in decisions_raw:
+            if isinstance(decision_dict, dict) and isinstance(decision_dict.get('symbol'), str):
+                decision_dict['symbol'] = sys.intern(decision_dict['symbol'])
+        
+        # 开仓决策的数值校验先整体向量化完成，只有未通过的才逐条验证以生成错误信息
+        fast_passed = self._batch_validate_open_positions(decisions_raw, total_equity, market_data_map)
+        
         for i, decision_dict in enumerate(decisions_raw):
             if not isinstance(decision_dict, dict):
                 logger.warning(f"⚠️ 决策 {i+1} 格式错误，跳过")
@@ -102,16 +149,19 @@ class RiskCheck:
             action = decision_dict.get('action', '')
             
             # 验证决策
-            is_valid, error_message = self._validate_decision(
-                decision_dict, 
-                total_equity,
-                positions,
-                market_data_map
-            )
+            if fast_passed[i]:
+                is_valid, error_message = True, ""
+            else:
+                is_valid, error_message = self._validate_decision(
+                    decision_dict, 
+                    total_equity,
+                    positions_by_symbol,
+                    market_data_map
+                )
             
             if is_valid:
                 validated_decisions.append(decision_dict)
-                logger.debug(f"✅ {symbol} {action} 验证通过")
+                logger.debug("✅ {} {} 验证通过", symbol, action)
             else:
                 validation_errors.append({
                     'symbol': symbol,
@@ -122,18 +172,18 @@ class RiskCheck:
         
         # 5. 账户风险检查（如果有关注开仓操作）
         has_open_actions = any(
-            d.get('action') in {'open_long', 'open_short'} 
+            d.get('action') in self.OPEN_ACTIONS 
             for d in validated_decisions
         )
         
         if has_open_actions:
-            account_risk_ok, account_risk_msg = self._check_account_risk(account_info)
+            account_risk_ok, account_risk_msg = self._check_account_risk(total_equity, margin_used_pct)
             if not account_risk_ok:
                 logger.warning(f"⚠️ 账户风险检查失败: {account_risk_msg}")
                 # 拒绝所有开仓操作
                 validated_decisions = [
                     d for d in validated_decisions 
-                    if d.get('action') not in {'open_long', 'open_short'}
+                    if d.get('action') not in self.OPEN_ACTIONS
                 ]
                 validation_errors.append({
                     'symbol': 'ALL',
@@ -159,11 +209,73 @@ class RiskCheck:
         return state
     
     
+    def _batch_validate_open_positions(
+        self,
+        decisions: List,
+        account_equity: float,
+        market_data_map: Dict[str, Dict]
+    ) -> List[bool]:
+        """一次性向量化校验所有开仓决策（与 _validate_open_position 规则一致）
+        
+        只判定"确定通过"：字段缺失、类型异常或任一规则未通过的决策返回 False，
+        交由 _validate_decision 逐条验证并生成具体错误信息。
+        
+        Returns:
+            与 decisions 等长的布尔列表，True 表示已通过全部开仓校验
+        """
+        n = len(decisions)
+        rows = [
+            i for i, d in enumerate(decisions)
+            if isinstance(d, dict) and d.get('action') in self.OPEN_ACTIONS
+        ]
+        if not rows:
+            return [False] * n
+        
+        # 单次遍历逐行取出所需字段（每个决策只访问一次），再整体转成二维数组按列取用（行存 -> 列存）
+        # 非数值（None、字符串等）记为 NaN，NaN 参与的比较均为 False，自然落入逐条验证
+        numeric_rows = []
+        flag_rows = []
+        for i in rows:
+            d = decisions[i]
+            symbol = d.get('symbol', '')
+            risk_usd = d.get('risk_usd')
+            price = self._get_current_price(symbol, market_data_map)
+            numeric_rows.append((
+                _as_number(d.get('leverage')),
+                _as_number(d.get('position_size_usd')),
+                _as_number(d.get('stop_loss')),
+                _as_number(d.get('take_profit')),
+                _as_number(risk_usd),
+                np.nan if price is None else price,
+            ))
+            flag_rows.append((d.get('action') == 'open_long', self._is_btc_eth(symbol), risk_usd is None))
+        
+        leverage, size, stop_loss, take_profit, risk_usd, price = np.array(numeric_rows, dtype=np.float64).T
+        is_long, is_btc_eth, risk_usd_missing = np.array(flag_rows, dtype=bool).T
+        
+        max_leverage = np.where(is_btc_eth, self._btc_eth_limits[0], self._altcoin_limits[0])
+        max_position_value = account_equity * np.where(is_btc_eth, self._btc_eth_limits[1], self._altcoin_limits[1])
+        rrr_valid, _ = rrr_kernel(price, stop_loss, take_profit, is_long, self.MIN_RISK_REWARD_RATIO)
+        
+        passed = (
+            (leverage > 0) & (leverage <= max_leverage)
+            & (size > 0) & (size <= max_position_value)
+            & (stop_loss > 0) & (take_profit > 0)
+            & np.where(is_long, stop_loss < take_profit, stop_loss > take_profit)
+            & rrr_valid
+            & (risk_usd_missing | (risk_usd > 0))
+        )
+        
+        result = [False] * n
+        for i, ok in zip(rows, passed.tolist()):
+            result[i] = ok
+        return result
+    
     def _validate_decision(
         self, 
         decision: Dict, 
         account_equity: float,
-        positions: List[Dict],
+        positions_by_symbol: Dict[str, Dict],
         market_data_map: Dict[str, Dict]
     ) -> Tuple[bool, str]:
         """验证单个决策的合法性
@@ -177,15 +289,15 @@ class RiskCheck:
             return False, f"无效的action: {action}"
         
         # 2. 开仓操作验证
-        if action in {"open_long", "open_short"}:
+        if action in self.OPEN_ACTIONS:
             return self._validate_open_position(decision, account_equity, market_data_map)
         
         # 3. 平仓操作验证
-        elif action in {"close_long", "close_short"}:
-            return self._validate_close_position(decision, positions)
+        elif action in self.CLOSE_ACTIONS:
+            return self._validate_close_position(decision, positions_by_symbol)
         
         # 4. hold/wait 操作不需要验证
-        elif action in {"hold", "wait"}:
+        elif action in self.HOLD_WAIT_ACTIONS:
             return True, ""
         
         return False, f"未知的action: {action}"
@@ -205,12 +317,19 @@ class RiskCheck:
         take_profit = decision.get('take_profit')
         risk_usd = decision.get('risk_usd')
         
+        # 非数值字段（字符串、NaN 等）直接判定无效，避免后续比较抛出 TypeError
+        for field in self.OPEN_NUMBER_FIELDS:
+            value = decision.get(field)
+            if value is not None and not _is_number(value):
+                return False, f"开仓字段 {field} 必须为数值，实际为 {value!r}"
+        
         # 验证杠杆
         if leverage is None or leverage <= 0:
             return False, "开仓操作必须提供有效的杠杆倍数"
         
-        is_btc_eth = self._is_btc_eth(symbol)
-        max_leverage = self.btc_eth_leverage if is_btc_eth else self.altcoin_leverage
+        max_leverage, max_position_multiplier = (
+            self._btc_eth_limits if self._is_btc_eth(symbol) else self._altcoin_limits
+        )
         
         if leverage > max_leverage:
             return False, f"杠杆 ({leverage}x) 超过上限 ({max_leverage}x)"
@@ -220,10 +339,6 @@ class RiskCheck:
             return False, "开仓操作必须提供有效的仓位大小（USD）"
         
         # 验证仓位价值上限
-        max_position_multiplier = (
-            self.MAX_POSITION_VALUE_BTC_ETH_MULTIPLIER if is_btc_eth 
-            else self.MAX_POSITION_VALUE_ALTCOIN_MULTIPLIER
-        )
         max_position_value = account_equity * max_position_multiplier
         
         if position_size_usd > max_position_value:
@@ -267,18 +382,14 @@ class RiskCheck:
     def _validate_close_position(
         self, 
         decision: Dict, 
-        positions: List[Dict]
+        positions_by_symbol: Dict[str, Dict]
     ) -> Tuple[bool, str]:
         """验证平仓操作"""
         symbol = decision.get('symbol', '')
         action = decision.get('action', '')
         
         # 查找持仓
-        position = None
-        for pos in positions:
-            if pos.get('symbol') == symbol:
-                position = pos
-                break
+        position = positions_by_symbol.get(symbol)
         
         if not position:
             return False, f"未找到 {symbol} 的持仓"
@@ -312,6 +423,7 @@ class RiskCheck:
         if stop_loss is None or take_profit is None:
             return False, 0.0
         
+        # 单个决策直接做标量运算（与批量路径的 rrr_kernel 口径一致）
         if action == "open_long":
             # 做多：风险 = 当前价 - 止损，收益 = 止盈 - 当前价
             risk = current_price - stop_loss
@@ -321,7 +433,8 @@ class RiskCheck:
             risk = stop_loss - current_price
             reward = current_price - take_profit
         
-        if risk <= 0:
+        # 风险 <= 0 或为 NaN 时不通过
+        if not risk > 0:
             return False, 0.0
         
         ratio = reward / risk
@@ -329,29 +442,34 @@ class RiskCheck:
         
         # 详细日志
         logger.debug(
-            f"风险回报比检查: {decision.get('symbol')} {action} | "
-            f"当前价={current_price:.2f} 止损={stop_loss:.2f} 止盈={take_profit:.2f} | "
-            f"风险={risk:.2f} 收益={reward:.2f} | "
-            f"风险回报比={ratio:.2f}:1 {'✓' if is_valid else '✗ (要求≥' + str(self.MIN_RISK_REWARD_RATIO) + ':1)'}"
+            "风险回报比检查: {} {} | 当前价={:.2f} 止损={:.2f} 止盈={:.2f} | 风险={:.2f} 收益={:.2f} | 风险回报比={:.2f}:1 {}",
+            decision.get('symbol'), action, current_price, stop_loss, take_profit, risk, reward, ratio,
+            '✓' if is_valid else f'✗ (要求≥{self.MIN_RISK_REWARD_RATIO}:1)'
         )
         
         return is_valid, ratio
     
-    def _is_btc_eth(self, symbol: str) -> bool:
-        """判断是否为BTC或ETH"""
-        normalized = symbol.upper().replace('/', '').replace('USDT', '').replace(':', '')
-        return normalized in ['BTC', 'ETH']
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _is_btc_eth(symbol: str) -> bool:
+        """判断是否为BTC或ETH（币种集合每轮基本相同，结果按symbol缓存）
+        
+        取基础币种比较：BTC/USDT、BTC/USDT:USDT、BTC/USDC:USDC、BTCUSDT 均识别为 BTC
+        """
+        base = symbol.upper().split('/', 1)[0].split(':', 1)[0].removesuffix('USDT')
+        return base in RiskCheck.BTC_ETH_BASES
     
     def _get_current_price(self, symbol: str, market_data_map: Dict[str, Dict]) -> Optional[float]:
         """从market_data_map获取当前价格"""
         market_data = market_data_map.get(symbol, {})
-        # 尝试多种可能的字段名
-        current_price = (
-            market_data.get('current_price') or
-            market_data.get('price') or
-            market_data.get('last_price') or
-            market_data.get('close')
-        )
+        current_price = market_data.get(self._price_key) if self._price_key else None
+        if not current_price:
+            # 按优先级尝试多种可能的字段名，记住第一个有值的字段
+            for key in self.PRICE_KEYS:
+                current_price = market_data.get(key)
+                if current_price:
+                    self._price_key = key
+                    break
         
         if current_price is not None:
             try:
@@ -361,11 +479,14 @@ class RiskCheck:
         
         return None
     
-    def _check_account_risk(self, account_info: Dict) -> Tuple[bool, str]:
+    @staticmethod
+    def _get_account_scalars(state: DecisionState) -> Tuple[float, Optional[float]]:
+        """从 account_balance 中读取 (账户净值, 保证金使用率%)"""
+        account_balance = state.get('account_balance') or {}
+        return account_balance.get('total_equity', 0), account_balance.get('margin_used_pct', 0)
+    
+    def _check_account_risk(self, total_equity: float, margin_used_pct: Optional[float]) -> Tuple[bool, str]:
         """检查账户风险"""
-        total_equity = account_info.get('total_equity', 0)
-        margin_used_pct = account_info.get('margin_used_pct', 0)
-        
         # 检查账户净值
         if total_equity <= 0:
             return False, "账户净值无效或为0"
@@ -389,59 +510,52 @@ class RiskCheck:
         if not self.decision_log_service or not self.trader_id:
             logger.debug("决策日志服务未初始化或 trader_id 不存在，跳过保存")
             return
+        if not validated_decisions:
+            return
         
-        # 创建原始决策的映射（用于获取完整的决策信息如reasoning, confidence）
-        original_decision_map = {}
-        for orig_decision in original_decisions:
-            symbol = orig_decision.get('symbol', '')
-            if symbol:
-                original_decision_map[symbol] = orig_decision
+        # 原始决策的映射（用于补全 reasoning, confidence）；验证通过的决策通常已包含这些字段，按需才构建
+        original_decision_map = None
         
         # 准备状态快照（只保存关键信息，避免数据过大）
         state_snapshot = {
             'candidate_symbols': state.get('candidate_symbols', []),
             'positions': state.get('positions', []),
             'account_balance': state.get('account_balance'),
-            'market_data_map_keys': list(state.get('market_data_map', {}).keys()),
-            'signal_data_map_keys': list(state.get('signal_data_map', {}).keys()),
+            'market_data_map_keys': tuple(state.get('market_data_map') or ()),
+            'signal_data_map_keys': tuple(state.get('signal_data_map') or ()),
             'call_count': state.get('call_count'),
             'runtime_minutes': state.get('runtime_minutes'),
             'risk_approved': state.get('risk_approved', False),
             'validation_errors': state.get('ai_decision', {}).get('validation_errors', []),
         }
         
-        # 为每个通过验证的决策保存日志
+        # 收集通过验证的决策，交给后台线程批量写入（不阻塞决策流程）
+        log_entries = []
         for validated_decision in validated_decisions:
-            try:
-                symbol = validated_decision.get('symbol', '')
-                action = validated_decision.get('action', '')
-                
-                if not symbol:
-                    logger.warning("⚠️ 决策缺少 symbol，跳过保存")
-                    continue
-                
+            symbol = validated_decision.get('symbol', '')
+            if not symbol:
+                logger.warning("⚠️ 决策缺少 symbol，跳过保存")
+                continue
+            
+            source = validated_decision
+            if 'reasoning' not in source or 'confidence' not in source:
                 # 从原始决策中获取完整信息（reasoning, confidence等）
-                original_decision = original_decision_map.get(symbol, validated_decision)
-                reasoning = original_decision.get('reasoning', '')
-                confidence = original_decision.get('confidence')
-                
-                # 转换置信度
-                confidence_decimal = None
-                if confidence is not None:
-                    try:
-                        confidence_decimal = Decimal(str(confidence))
-                    except Exception as e:
-                        logger.warning(f"⚠️ 转换置信度失败: {e}")
-                
-                # 保存决策日志
-                self.decision_log_service.record_decision(
-                    trader_id=self.trader_id,
-                    symbol=symbol,
-                    decision_state=state_snapshot,
-                    decision_result=action,
-                    reasoning=reasoning,
-                    confidence=confidence_decimal
-                )
-            except Exception as e:
-                logger.warning(f"⚠️ 保存决策日志失败: {symbol} - {e}", exc_info=True)
-                # 继续处理其他决策，不中断流程
+                if original_decision_map is None:
+                    original_decision_map = {
+                        d['symbol']: d for d in original_decisions
+                        if isinstance(d, dict) and d.get('symbol')
+                    }
+                source = original_decision_map.get(symbol) or validated_decision
+            log_entries.append({
+                'symbol': symbol,
+                'decision_result': validated_decision.get('action', ''),
+                'reasoning': source.get('reasoning', ''),
+                'confidence': source.get('confidence'),
+            })
+        
+        if log_entries:
+            self.decision_log_service.record_decisions_async(
+                trader_id=self.trader_id,
+                decisions=log_entries,
+                decision_state=state_snapshot
+            )
@@ -1,10 +1,12 @@
 from decision_engine.state import DecisionState
 from services.market.api_client import APIClient
-from utils.logger import logger
+from utils.logger import logger, log_error_throttled
 from typing import Optional, List, Dict
 from services.market.monitor import MarketMonitor
 import asyncio
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
 from services.trader.CCXT_trader import CCXTTrader
 
 class DataCollector:
@@ -13,18 +15,87 @@ class DataCollector:
     # K线数据配置
     KLINE_LIMIT = 200  # K线数据获取数量
     
-    # WebSocket订阅配置
-    WS_SUBSCRIBE_TIMEOUT_SECONDS = 5  # WebSocket订阅超时时间（秒）
+    KLINE_FETCH_WORKERS = 16  # REST API 并发获取K线的线程数
+    KLINE_INTERVALS = ("3m", "4h")  # 收集的K线周期
     
-    def __init__(self, market_monitor: Optional[MarketMonitor] = None):
+    # 账户余额缓存配置
+    BALANCE_CACHE_TTL_SECONDS = 30  # 余额缓存有效期（秒）
+    
+    def __init__(
+        self,
+        market_monitor: Optional[MarketMonitor] = None,
+        api_client: Optional[APIClient] = None
+    ):
         """
         初始化数据收集节点
         
         Args:
             market_monitor: 市场数据监控器（可选）
+            api_client: 共享的REST API客户端（可选，未提供时首次运行再创建）
         """
         self.market_monitor = market_monitor
-        self.api_client: Optional[APIClient] = None  # 延迟初始化
+        self.api_client: Optional[APIClient] = api_client
+        self.ccxt_trader: Optional[CCXTTrader] = None  # 延迟初始化
+        self._balance_cache = (None, 0.0)  # (余额, 获取时间 monotonic)
+        # REST 回退时各币种、各周期的K线请求并发执行，总耗时约为最慢的一次请求而非所有请求之和（首次使用时创建）
+        self._kline_executor: Optional[ThreadPoolExecutor] = None
+        # 常驻的后台事件循环（首次订阅时启动），订阅协程通过 run_coroutine_threadsafe 提交
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+        # 已确认订阅成功的币种（本地集合，命中时无需再查询监控器）
+        self._subscribed: set = set()
+        # 订阅进行中的币种 -> 后台订阅任务（不阻塞当前轮次，完成后下一轮起使用WebSocket数据）
+        self._pending_subscribe: Dict[str, Future] = {}
+        # 逐币种错误的堆栈输出限流：symbol -> 上次输出时间（monotonic）
+        self._last_tb_log: Dict[str, float] = {}
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """获取后台事件循环（延迟启动，之后一直复用，不再每次新建线程和事件循环）"""
+        with self._loop_lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    daemon=True,
+                    name="DataCollectorLoop"
+                )
+                self._loop_thread.start()
+            return self._loop
+
+    def _get_kline_executor(self) -> ThreadPoolExecutor:
+        """获取K线请求线程池（延迟创建，close 之后再次运行时重新创建）"""
+        with self._loop_lock:
+            if self._kline_executor is None:
+                self._kline_executor = ThreadPoolExecutor(
+                    max_workers=self.KLINE_FETCH_WORKERS, thread_name_prefix="kline-fetch"
+                )
+            return self._kline_executor
+
+    def close(self):
+        """停止后台事件循环并释放线程池（交易员停止时调用；之后再次运行会重新创建）"""
+        with self._loop_lock:
+            loop, self._loop = self._loop, None
+            loop_thread, self._loop_thread = self._loop_thread, None
+            executor, self._kline_executor = self._kline_executor, None
+        # 事件循环停止后进行中的订阅不会再完成，下次运行时重新提交
+        for future in self._pending_subscribe.values():
+            future.cancel()
+        self._pending_subscribe.clear()
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            if loop_thread:
+                loop_thread.join(timeout=5)
+            if loop_thread is None or not loop_thread.is_alive():
+                # 取消循环中剩余的任务（如被取消的订阅），让它们在关闭前完成清理
+                pending = asyncio.all_tasks(loop)
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+                loop.close()
+        if executor is not None:
+            executor.shutdown(wait=False)
 
     def _get_api_client(self, state: DecisionState) -> Optional[APIClient]:
         """从state获取exchange_config并创建APIClient（延迟初始化）"""
@@ -40,6 +111,12 @@ class DataCollector:
         logger.warning("⚠️ exchange_config未设置，无法创建APIClient")
         return None
 
+    def _get_ccxt_trader(self, exchange_config: dict) -> CCXTTrader:
+        """获取CCXTTrader（延迟初始化，复用同一个交易所连接）"""
+        if self.ccxt_trader is None:
+            self.ccxt_trader = CCXTTrader(exchange_config)
+        return self.ccxt_trader
+
     def _get_account_balance(self, state: DecisionState) -> float:
         """
         获取账户余额（留空，等待Exchange服务重构完成）
@@ -58,9 +135,15 @@ class DataCollector:
         # TODO: 实现获取账户余额的逻辑
         # 当前返回0.0，表示未实现
         logger.debug("获取账户余额（待实现）")
-        ccxt_trader = CCXTTrader(exchange_config)
-        logger.info(f"CCXTTrader account_balance: {ccxt_trader.get_balance()}")
-        return ccxt_trader.get_balance()
+        cached_balance, fetched_at = self._balance_cache
+        if cached_balance is not None and time.monotonic() - fetched_at < self.BALANCE_CACHE_TTL_SECONDS:
+            logger.debug("使用缓存的账户余额")
+            return cached_balance
+        
+        account_balance = self._get_ccxt_trader(exchange_config).get_balance()
+        self._balance_cache = (account_balance, time.monotonic())
+        logger.debug("CCXTTrader account_balance: {}", account_balance)
+        return account_balance
 
     def _get_positions(self, state: DecisionState) -> List[Dict]:
         """
@@ -79,9 +162,9 @@ class DataCollector:
         
         # TODO: 实现获取持仓的逻辑
         # 当前返回空列表，表示未实现
-        ccxt_trader = CCXTTrader(exchange_config)
-        logger.info(f"CCXTTrader positions: {ccxt_trader.get_all_position()}")
-        return ccxt_trader.get_all_position()
+        positions = self._get_ccxt_trader(exchange_config).get_all_position()
+        logger.debug("CCXTTrader positions: {}", positions)
+        return positions
 
     def run(self, state: DecisionState) -> DecisionState:
         """
@@ -103,13 +186,13 @@ class DataCollector:
         
         
         # 2. 获取持仓币种（用于收集市场数据）
-        position_symbols = {pos.get('symbol') for pos in positions if pos.get('symbol')}
+        position_symbols = frozenset(pos.get('symbol') for pos in positions if pos.get('symbol'))
         
-        # 3. 获取候选币种（用于开仓决策）
-        candidate_symbols = state.get('candidate_symbols', [])
+        # 3. 获取候选币种（用于开仓决策，转为集合避免在循环中对列表做线性查找）
+        candidate_symbols = frozenset(state.get('candidate_symbols') or ())
         
         # 4. 合并去重，确保所有需要的币种都有数据
-        all_symbols = list(set(position_symbols) | set(candidate_symbols))
+        all_symbols = list(position_symbols | candidate_symbols)
         
         if not all_symbols:
             logger.warning("没有需要收集数据的币种，跳过市场数据收集")
@@ -129,13 +212,20 @@ class DataCollector:
             state['market_data_map'] = {}
             return state
         
-        # 7. 收集市场数据
+        # 7. 收集市场数据：监控器缓存命中的直接读取，其余币种的REST请求统一并发提交
+        # 持仓/候选标记在循环前一次性计算，两条数据路径共用
+        symbol_flags = {
+            symbol: {'is_position': symbol in position_symbols, 'is_candidate': symbol in candidate_symbols}
+            for symbol in all_symbols
+        }
         market_data_map = {}
+        rest_futures = {}
+        kline_executor = self._get_kline_executor()
         
         for symbol in all_symbols:
             try:
-                # 优先从监控器缓存获取数据
-                if self.market_monitor and self.market_monitor.is_monitoring(symbol):
+                # 优先从监控器缓存获取数据（仅限已确认订阅完成的币种，订阅中的币种缓存尚未就绪）
+                if self.market_monitor and symbol in self._subscribed:
                     klines_3m = self.market_monitor.get_klines(symbol, "3m", limit=self.KLINE_LIMIT)
                     klines_4h = self.market_monitor.get_klines(symbol, "4h", limit=self.KLINE_LIMIT)
                     latest_price = self.market_monitor.get_latest_price(symbol)
@@ -145,27 +235,40 @@ class DataCollector:
                         'current_price': latest_price,
                         'klines_3m': klines_3m,
                         'klines_4h': klines_4h,
+                        # 列式K线（与上面同一窗口），供特征计算直接使用
+                        'columns_3m': self.market_monitor.get_kline_columns(symbol, "3m", limit=self.KLINE_LIMIT),
+                        'columns_4h': self.market_monitor.get_kline_columns(symbol, "4h", limit=self.KLINE_LIMIT),
                         'source': 'websocket_cache',
-                        'is_position': symbol in position_symbols,  # 标记是否为持仓币种
-                        'is_candidate': symbol in candidate_symbols  # 标记是否为候选币种
+                        **symbol_flags[symbol]  # 标记是否为持仓币种/候选币种
                     }
-                    logger.debug(f"{symbol}: 从监控器缓存获取数据")
+                    logger.debug("{}: 从监控器缓存获取数据", symbol)
                 else:
-                    # 回退到 REST API
-                    klines_3m = api_client.get_Klines(symbol, "3m", limit=self.KLINE_LIMIT)
-                    klines_4h = api_client.get_Klines(symbol, "4h", limit=self.KLINE_LIMIT)
-                    
-                    market_data_map[symbol] = {
-                        'symbol': symbol,
-                        'klines_3m': klines_3m or [],
-                        'klines_4h': klines_4h or [],
-                        'source': 'rest_api',
-                        'is_position': symbol in position_symbols,
-                        'is_candidate': symbol in candidate_symbols
-                    }
-                    logger.debug(f"{symbol}: 从REST API获取数据")
+                    # 回退到 REST API（先提交，稍后统一收集结果）
+                    rest_futures[symbol] = [
+                        kline_executor.submit(api_client.get_Klines, symbol, interval, limit=self.KLINE_LIMIT)
+                        for interval in self.KLINE_INTERVALS
+                    ]
+            except Exception as e:
+                log_error_throttled(self._last_tb_log, symbol, f"收集{symbol}市场数据失败: {e}", e)
+                market_data_map[symbol] = {
+                    'symbol': symbol,
+                    'error': str(e)
+                }
+        
+        for symbol, (future_3m, future_4h) in rest_futures.items():
+            try:
+                klines_3m = future_3m.result()
+                klines_4h = future_4h.result()
+                market_data_map[symbol] = {
+                    'symbol': symbol,
+                    'klines_3m': klines_3m or [],
+                    'klines_4h': klines_4h or [],
+                    'source': 'rest_api',
+                    **symbol_flags[symbol]
+                }
+                logger.debug("{}: 从REST API获取数据", symbol)
             except Exception as e:
-                logger.error(f"收集{symbol}市场数据失败: {e}", exc_info=True)
+                log_error_throttled(self._last_tb_log, symbol, f"收集{symbol}市场数据失败: {e}", e)
                 market_data_map[symbol] = {
                     'symbol': symbol,
                     'error': str(e)
@@ -176,48 +279,53 @@ class DataCollector:
         return state
     
     def _ensure_symbols_monitored(self, symbols: list):
-        """确保所有币种都已添加到监控器（动态订阅WebSocket）"""
+        """确保所有币种都已添加到监控器（动态订阅WebSocket，非阻塞提交）"""
         if not self.market_monitor:
             return
         
-        # 检查哪些币种需要添加
-        symbols_to_add = [s for s in symbols if not self.market_monitor.is_monitoring(s)]
+        # 先收割已完成的订阅任务
+        self._collect_finished_subscriptions()
+        
+        # 检查哪些币种需要添加（已确认订阅或订阅中的直接跳过）
+        symbols_to_add = [
+            s for s in symbols
+            if s not in self._subscribed and s not in self._pending_subscribe
+        ]
         
         if not symbols_to_add:
             logger.debug("所有币种已在监控中")
             return
         
-        logger.debug(f"需要添加{len(symbols_to_add)}个币种到监控器")
+        logger.debug("需要添加{}个币种到监控器", len(symbols_to_add))
         
-        # 在独立线程中运行异步操作（因为监控器的事件循环在另一个线程）
-        def add_symbols_async():
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                for symbol in symbols_to_add:
-                    try:
-                        loop.run_until_complete(
-                            self.market_monitor.add_symbol(symbol, intervals=["3m", "4h"])
-                        )
-                        logger.debug(f"已添加{symbol}到监控器并订阅WebSocket")
-                    except Exception as e:
-                        logger.error(f"添加{symbol}到监控器失败: {e}", exc_info=True)
-            except Exception as e:
-                logger.error(f"添加币种到监控器失败: {e}", exc_info=True)
-            finally:
-                loop.close()
+        # 批量添加：历史K线并发加载，WebSocket 流一次性订阅（提交到常驻的后台事件循环后立即返回）
+        # 本轮这些币种走REST回退，订阅完成后下一轮起使用WebSocket缓存
+        future = asyncio.run_coroutine_threadsafe(
+            self.market_monitor.add_symbols(symbols_to_add, intervals=list(self.KLINE_INTERVALS)),
+            self._get_loop()
+        )
+        for s in symbols_to_add:
+            self._pending_subscribe[s] = future
+    
+    def _collect_finished_subscriptions(self):
+        """检查后台订阅任务，完成的币种标记为已订阅，失败的移出等待列表以便下一轮重试"""
+        if not self._pending_subscribe:
+            return
+        
+        done = [(s, f) for s, f in self._pending_subscribe.items() if f.done()]
+        failed_symbols = []
+        for s, future in done:
+            del self._pending_subscribe[s]
+            if not future.cancelled() and future.exception() is None:
+                self._subscribed.add(s)
+            # 批量任务失败时监控器会移除本批币种；仍在监控中的是此前已由其他调用订阅的币种
+            elif self.market_monitor.is_monitoring(s):
+                self._subscribed.add(s)
+            else:
+                failed_symbols.append(s)
         
-        # 在后台线程中执行（不阻塞主流程）
-        thread = threading.Thread(target=add_symbols_async, daemon=True)
-        thread.start()
-        # 等待订阅完成
-        thread.join(timeout=self.WS_SUBSCRIBE_TIMEOUT_SECONDS)
-        
-        if thread.is_alive():
-            logger.warning("添加币种到监控器超时，将使用REST API回退")
-        else:
-            # 验证订阅状态
-            failed_symbols = [s for s in symbols_to_add if not self.market_monitor.is_monitoring(s)]
-            if failed_symbols:
-                logger.warning(f"以下币种订阅失败，将使用REST API: {failed_symbols}")
+        if done:
+            logger.debug("已确认{}个币种完成WebSocket订阅", len(done) - len(failed_symbols))
+        if failed_symbols:
+            logger.warning(f"以下币种订阅失败，将使用REST API: {failed_symbols}")
     
\ No newline at end of file
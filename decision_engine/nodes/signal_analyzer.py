@@ -1,9 +1,13 @@
+import threading
+import numpy as np
 from decision_engine.state import DecisionState
-from utils.logger import logger
+from utils.logger import logger, log_error_throttled
 from services.market.api_client import APIClient
 from services.market.feature_engine import FeatureEngine, MarketFeatures
 from typing import Optional, Dict
-from dataclasses import asdict
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import fields
 
 # 前向引用，避免循环导入
 from typing import TYPE_CHECKING
@@ -11,17 +15,45 @@ if TYPE_CHECKING:
     from services.market.performance import PerformanceAnalyzer
     from config.settings import Settings
 
+
+# 逐币种分析的并发线程（所有交易员共享，持仓量/资金费率等网络请求相互重叠）
+_analysis_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="signal-analyze")
+
+# MarketFeatures 字段名（模块加载时计算一次，用于浅拷贝转字典）
+_FIELD_NAMES = tuple(f.name for f in fields(MarketFeatures))
+
+# 警报检测用到的特征字段及缺省值（顺序即 _detect_alerts 中的列顺序）
+_ALERT_KEYS = (
+    ('price_change_1h', 0),
+    ('price_change_4h', 0),
+    ('current_volume_4h', 0),
+    ('average_volume_4h', 0),
+    ('rsi14_4h', 50),
+    ('macd_4h', 0),
+    ('macd_3m', 0),
+    ('open_interest', None),
+    ('open_interest_average', None),
+)
+
+
 class SignalAnalyzer:
     """信号分析节点 - 计算技术指标和流动性过滤（使用FeatureEngine）"""
     
     # 流动性阈值（USD）
     LIQUIDITY_THRESHOLD_EXISTING = 5_000_000  # 持仓币种：5M USD
     LIQUIDITY_THRESHOLD_NEW = 15_000_000  # 新币种：15M USD
+    # 阈值展示文本（类加载时计算一次）
+    _THRESHOLD_STR_EXISTING = f"{LIQUIDITY_THRESHOLD_EXISTING / 1_000_000:.0f}M"
+    _THRESHOLD_STR_NEW = f"{LIQUIDITY_THRESHOLD_NEW / 1_000_000:.0f}M"
+    
+    # 特征缓存上限（LRU淘汰）
+    FEATURE_CACHE_MAX_SIZE = 1000
     
     def __init__(
         self, 
         trader_id: Optional[str] = None,
-        settings: Optional['Settings'] = None
+        settings: Optional['Settings'] = None,
+        api_client: Optional[APIClient] = None
     ):
         """
         初始化信号分析节点
@@ -29,12 +61,22 @@ class SignalAnalyzer:
         Args:
             trader_id: 交易员ID
             settings: 设置对象
+            api_client: 共享的REST API客户端（可选，未提供时首次运行再创建）
         """
         self.trader_id = trader_id
         self.settings = settings
-        self.api_client: Optional[APIClient] = None  # 延迟初始化
-        self.feature_engine: Optional[FeatureEngine] = None  # 延迟初始化
+        self.api_client: Optional[APIClient] = api_client
+        self.feature_engine: Optional[FeatureEngine] = FeatureEngine(api_client) if api_client else None
         self.performance_analyzer = None
+        # 特征缓存：symbol -> (最新K线键, MarketFeatures)，无新K线时复用上一轮结果
+        self._feature_cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._feature_cache_lock = threading.Lock()
+        # 上一轮输入快照及结果：输入未变化时整轮复用，跳过逐币种循环和警报检测
+        self._last_snapshot_key: Optional[tuple] = None
+        self._last_signal_data_map: Dict[str, Dict] = {}
+        self._last_alerts: list = []
+        # 逐币种错误的堆栈输出限流：symbol -> 上次输出时间（monotonic）
+        self._last_tb_log: Dict[str, float] = {}
         
         # 如果提供了 trader_id 和 settings，初始化性能分析器
         if trader_id and settings:
@@ -72,41 +114,17 @@ class SignalAnalyzer:
         
         market_data_map = state.get('market_data_map', {})
         existing_positions = state.get('positions', [])
-        signal_data_map = {}
+        existing_symbols = frozenset(pos.get('symbol') for pos in existing_positions if pos.get('symbol'))
         
-        existing_symbols = {pos.get('symbol') for pos in existing_positions if pos.get('symbol')}
-
-        for symbol, raw_data in market_data_map.items():
-            try:
-                # 检查是否有错误标记
-                if 'error' in raw_data:
-                    logger.warning(f"{symbol}数据收集失败: {raw_data.get('error')}，跳过")
-                    continue
-                
-                # 获取K线数据
-                klines_3m = raw_data.get('klines_3m', [])
-                klines_4h = raw_data.get('klines_4h', [])
-                
-                # 使用FeatureEngine统一计算所有特征
-                features = self.feature_engine.calculate_features(symbol, klines_3m, klines_4h)
-                if not features:
-                    continue
-                
-                # 流动性过滤
-                is_existing_position = symbol in existing_symbols
-                if not self._check_liquidity(features, is_existing_position):
-                    if not is_existing_position:
-                        continue
-                    # 持仓币种流动性不足时记录警告但继续处理
-                
-                # 转换为字典格式（使用dataclasses.asdict简化）
-                signal_data_map[symbol] = asdict(features)
-                
-                logger.debug(f"{symbol}信号分析完成")
-                
-            except Exception as e:
-                logger.error(f"{symbol}信号分析失败: {e}", exc_info=True)
-                continue
+        # 输入快照（各币种最新K线 + 持仓集合）与上一轮相同时，结果必然相同，直接复用
+        snapshot_key = self._snapshot_key(market_data_map, existing_symbols)
+        if snapshot_key == self._last_snapshot_key:
+            signal_data_map = self._last_signal_data_map
+            alerts = self._last_alerts
+            logger.debug("市场数据无变化，复用上一轮信号分析结果")
+        else:
+            signal_data_map = self._build_signal_data_map(market_data_map, existing_symbols)
+            alerts = None
         
         state['signal_data_map'] = signal_data_map
         
@@ -115,7 +133,7 @@ class SignalAnalyzer:
             try:
                 performance = self.performance_analyzer.get_performance_summary(self.trader_id)
                 state['performance'] = performance
-                logger.debug(f"性能分析完成: 夏普率={performance.get('sharpe_ratio')}")
+                logger.debug("性能分析完成: 夏普率={}", performance.get('sharpe_ratio'))
             except Exception as e:
                 logger.warning(f"性能分析失败: {e}")
                 state['performance'] = None
@@ -123,7 +141,11 @@ class SignalAnalyzer:
             state['performance'] = None
         
         # 检测市场警报
-        alerts = self._detect_alerts(signal_data_map)
+        if alerts is None:
+            alerts = self._detect_alerts(signal_data_map)
+            self._last_snapshot_key = snapshot_key
+            self._last_signal_data_map = signal_data_map
+            self._last_alerts = alerts
         state['alerts'] = alerts
         if alerts:
             logger.warning(f"⚠️ 检测到 {len(alerts)} 个市场警报")
@@ -131,23 +153,163 @@ class SignalAnalyzer:
         logger.info(f"完成信号分析，共{len(signal_data_map)}个币种")
         return state
 
+    @staticmethod
+    def _snapshot_key(market_data_map: dict, existing_symbols: frozenset) -> tuple:
+        """本轮输入快照：各币种最新3m/4h K线指纹及持仓集合（影响流动性过滤）"""
+        entries = []
+        for symbol, raw_data in market_data_map.items():
+            if 'error' in raw_data:
+                continue
+            klines_3m = raw_data.get('klines_3m') or ()
+            klines_4h = raw_data.get('klines_4h') or ()
+            last_3m = klines_3m[-1].fingerprint() if klines_3m else None
+            last_4h = klines_4h[-1].fingerprint() if klines_4h else None
+            entries.append((symbol, last_3m, last_4h))
+        entries.sort()
+        return (tuple(entries), existing_symbols)
+
+    def _build_signal_data_map(self, market_data_map: dict, existing_symbols: frozenset) -> Dict[str, Dict]:
+        """逐币种计算特征并做流动性过滤（各币种相互独立，并发执行；结果保持输入顺序）"""
+        futures = [
+            (symbol, _analysis_executor.submit(self._analyze_one, symbol, raw_data, existing_symbols))
+            for symbol, raw_data in market_data_map.items()
+        ]
+        signal_data_map = {}
+        for symbol, future in futures:
+            signals = future.result()
+            if signals is not None:
+                signal_data_map[symbol] = signals
+        return signal_data_map
+
+    def _analyze_one(self, symbol: str, raw_data: dict, existing_symbols: frozenset) -> Optional[Dict]:
+        """分析单个币种，返回信号字典；数据异常、特征不足或流动性不达标时返回None"""
+        try:
+            # 检查是否有错误标记
+            if 'error' in raw_data:
+                logger.warning(f"{symbol}数据收集失败: {raw_data.get('error')}，跳过")
+                return None
+            
+            # 获取K线数据
+            klines_3m = raw_data.get('klines_3m', [])
+            klines_4h = raw_data.get('klines_4h', [])
+            
+            # 使用FeatureEngine统一计算所有特征（无新K线时命中缓存）
+            features = self._get_features(
+                symbol, klines_3m, klines_4h,
+                raw_data.get('columns_3m'), raw_data.get('columns_4h')
+            )
+            if not features:
+                return None
+            
+            # 流动性过滤
+            is_existing_position = symbol in existing_symbols
+            if not self._check_liquidity(features, is_existing_position):
+                if not is_existing_position:
+                    return None
+                # 持仓币种流动性不足时记录警告但继续处理
+            
+            logger.debug("{}信号分析完成", symbol)
+            # 转换为字典格式（浅拷贝：下游只读，无需asdict的递归深拷贝）
+            return {name: getattr(features, name) for name in _FIELD_NAMES}
+            
+        except Exception as e:
+            log_error_throttled(self._last_tb_log, symbol, f"{symbol}信号分析失败: {e}", e)
+            return None
+
+    def _get_features(
+        self,
+        symbol: str,
+        klines_3m: list,
+        klines_4h: list,
+        columns_3m: Optional[dict] = None,
+        columns_4h: Optional[dict] = None
+    ) -> Optional[MarketFeatures]:
+        """获取币种特征，按最新K线指纹缓存，K线更新后自动失效"""
+        if not klines_3m or not klines_4h:
+            return self.feature_engine.calculate_features(symbol, klines_3m, klines_4h)
+        
+        # 指纹包含最新K线的高低价、收盘价和成交量：未收盘K线的任何变化都需要重新计算
+        key = (klines_3m[-1].fingerprint(), klines_4h[-1].fingerprint())
+        with self._feature_cache_lock:
+            cached = self._feature_cache.get(symbol)
+            if cached is not None and cached[0] == key:
+                self._feature_cache.move_to_end(symbol)
+                return cached[1]
+        
+        features = self.feature_engine.calculate_features(
+            symbol, klines_3m, klines_4h, columns_3m=columns_3m, columns_4h=columns_4h
+        )
+        with self._feature_cache_lock:
+            if features is None:
+                self._feature_cache.pop(symbol, None)
+                return None
+            
+            self._feature_cache[symbol] = (key, features)
+            self._feature_cache.move_to_end(symbol)
+            if len(self._feature_cache) > self.FEATURE_CACHE_MAX_SIZE:
+                self._feature_cache.popitem(last=False)
+        return features
+
     def _detect_alerts(self, signal_data_map: dict) -> list:
-        """检测市场警报（KISS原则：简单的阈值检测）"""
-        alerts = []
+        """检测市场警报（KISS原则：简单的阈值检测，阈值判断向量化）"""
+        if not signal_data_map:
+            return []
         
-        for symbol, signals in signal_data_map.items():
-            # 1. 价格异常检测
-            price_change_1h = signals.get('price_change_1h', 0)
-            price_change_4h = signals.get('price_change_4h', 0)
+        symbols = list(signal_data_map)
+        # 一次性抽取为二维数组（缺失/None -> NaN，NaN参与比较恒为False）
+        values = np.array(
+            [[signals.get(key, default) for key, default in _ALERT_KEYS]
+             for signals in signal_data_map.values()],
+            dtype=float,
+        )
+        pc1, pc4, cv4, av4, rsi, m4, m3, oi, oia = values.T
+        
+        # 向量化阈值判断（每类条件一次NumPy运算）
+        abs_pc1 = np.abs(pc1)
+        pc1_high = abs_pc1 > 10
+        pc1_medium = ~pc1_high & (abs_pc1 > 5)
+        pc4_medium = np.abs(pc4) > 10
+        with np.errstate(divide='ignore', invalid='ignore'):
+            volume_ratio = np.where((av4 > 0) & (cv4 > 0), cv4 / av4, np.nan)
+            oi_ratio = np.where(oia > 0, oi / oia, np.nan)
+        volume_spike = volume_ratio > 2.0
+        overbought = rsi > 80
+        oversold = rsi < 20
+        macd_bull_div = (m4 > 0) & (m3 < 0)
+        macd_bear_div = (m4 < 0) & (m3 > 0)
+        oi_drop = oi_ratio < 0.95  # 持仓量下降超过5%
+        
+        flags = np.column_stack((
+            pc1_high, pc1_medium, pc4_medium, volume_spike, overbought,
+            oversold, macd_bull_div, macd_bear_div, oi_drop,
+        ))
+        triggered = np.flatnonzero(flags.any(axis=1))
+        if triggered.size == 0:
+            return []
+        
+        # 转为Python列表后逐行元组解包，分支判断只读局部变量（避免逐元素NumPy索引）
+        rows = np.column_stack((values, volume_ratio, oi_ratio)).tolist()
+        flag_rows = flags.tolist()
+        
+        # 仅对命中的币种格式化消息（保持原有的按币种、按检测项顺序）
+        alerts = []
+        for i in triggered.tolist():
+            symbol = symbols[i]
+            (price_change_1h, price_change_4h, current_volume_4h, average_volume_4h,
+             rsi14_4h, macd_4h, macd_3m, open_interest, open_interest_average,
+             vol_ratio, oi_pct) = rows[i]
+            (is_pc1_high, is_pc1_medium, is_pc4_medium, is_volume_spike, is_overbought,
+             is_oversold, is_macd_bull_div, is_macd_bear_div, is_oi_drop) = flag_rows[i]
             
-            if abs(price_change_1h) > 10:
+            # 1. 价格异常检测
+            if is_pc1_high:
                 alerts.append({
                     'symbol': symbol,
                     'type': 'price_change',
                     'severity': 'high',
                     'message': f"{symbol} 1小时价格变化异常: {price_change_1h:+.2f}%"
                 })
-            elif abs(price_change_1h) > 5:
+            elif is_pc1_medium:
                 alerts.append({
                     'symbol': symbol,
                     'type': 'price_change',
@@ -155,7 +317,7 @@ class SignalAnalyzer:
                     'message': f"{symbol} 1小时价格变化较大: {price_change_1h:+.2f}%"
                 })
             
-            if abs(price_change_4h) > 10:
+            if is_pc4_medium:
                 alerts.append({
                     'symbol': symbol,
                     'type': 'price_change',
@@ -164,29 +326,23 @@ class SignalAnalyzer:
                 })
             
             # 2. 成交量异常检测
-            current_volume_4h = signals.get('current_volume_4h', 0)
-            average_volume_4h = signals.get('average_volume_4h', 0)
-            
-            if average_volume_4h > 0 and current_volume_4h > 0:
-                volume_ratio = current_volume_4h / average_volume_4h
-                if volume_ratio > 2.0:
-                    alerts.append({
-                        'symbol': symbol,
-                        'type': 'volume_spike',
-                        'severity': 'medium',
-                        'message': f"{symbol} 成交量异常: 当前 {current_volume_4h:.2f} vs 平均 {average_volume_4h:.2f} (倍数: {volume_ratio:.2f}x)"
-                    })
+            if is_volume_spike:
+                alerts.append({
+                    'symbol': symbol,
+                    'type': 'volume_spike',
+                    'severity': 'medium',
+                    'message': f"{symbol} 成交量异常: 当前 {current_volume_4h:.2f} vs 平均 {average_volume_4h:.2f} (倍数: {vol_ratio:.2f}x)"
+                })
             
             # 3. 技术指标信号检测
-            rsi14_4h = signals.get('rsi14_4h', 50)
-            if rsi14_4h > 80:
+            if is_overbought:
                 alerts.append({
                     'symbol': symbol,
                     'type': 'overbought',
                     'severity': 'medium',
                     'message': f"{symbol} RSI14超买: {rsi14_4h:.2f} (建议谨慎开多)"
                 })
-            elif rsi14_4h < 20:
+            elif is_oversold:
                 alerts.append({
                     'symbol': symbol,
                     'type': 'oversold',
@@ -194,19 +350,15 @@ class SignalAnalyzer:
                     'message': f"{symbol} RSI14超卖: {rsi14_4h:.2f} (可能反弹机会)"
                 })
             
-            # MACD信号检测（简单检测：MACD值的变化趋势）
-            macd_4h = signals.get('macd_4h', 0)
-            macd_3m = signals.get('macd_3m', 0)
-            
             # 如果4小时MACD和3分钟MACD方向相反，可能存在短期波动
-            if macd_4h > 0 and macd_3m < 0:
+            if is_macd_bull_div:
                 alerts.append({
                     'symbol': symbol,
                     'type': 'macd_divergence',
                     'severity': 'low',
                     'message': f"{symbol} MACD信号分歧: 4小时看涨({macd_4h:.2f})但3分钟看跌({macd_3m:.2f})"
                 })
-            elif macd_4h < 0 and macd_3m > 0:
+            elif is_macd_bear_div:
                 alerts.append({
                     'symbol': symbol,
                     'type': 'macd_divergence',
@@ -215,26 +367,24 @@ class SignalAnalyzer:
                 })
             
             # 4. 流动性风险检测（持仓量异常下降）
-            open_interest = signals.get('open_interest')
-            open_interest_average = signals.get('open_interest_average')
-            
-            if open_interest is not None and open_interest_average is not None and open_interest_average > 0:
-                oi_ratio = open_interest / open_interest_average
-                if oi_ratio < 0.95:  # 持仓量下降超过5%
-                    alerts.append({
-                        'symbol': symbol,
-                        'type': 'liquidity_risk',
-                        'severity': 'medium',
-                        'message': f"{symbol} 持仓量下降: 当前 {open_interest:.2f} vs 平均 {open_interest_average:.2f} (下降 {((1-oi_ratio)*100):.1f}%)"
-                    })
+            if is_oi_drop:
+                alerts.append({
+                    'symbol': symbol,
+                    'type': 'liquidity_risk',
+                    'severity': 'medium',
+                    'message': f"{symbol} 持仓量下降: 当前 {open_interest:.2f} vs 平均 {open_interest_average:.2f} (下降 {((1-oi_pct)*100):.1f}%)"
+                })
         
         return alerts
     
     def _check_liquidity(self, features, is_existing_position: bool) -> bool:
         """检查流动性（KISS原则：简单直接的阈值检查）"""
-        liquidity_threshold = self.LIQUIDITY_THRESHOLD_EXISTING if is_existing_position else self.LIQUIDITY_THRESHOLD_NEW
+        if is_existing_position:
+            liquidity_threshold, threshold_str = self.LIQUIDITY_THRESHOLD_EXISTING, self._THRESHOLD_STR_EXISTING
+        else:
+            liquidity_threshold, threshold_str = self.LIQUIDITY_THRESHOLD_NEW, self._THRESHOLD_STR_NEW
         
-        logger.debug(f"计算{features.symbol}的流动性（{'持仓币种' if is_existing_position else '新币种'}，阈值: {liquidity_threshold/1_000_000:.0f}M USD）")
+        logger.debug("计算{}的流动性（{}，阈值: {} USD）", features.symbol, '持仓币种' if is_existing_position else '新币种', threshold_str)
         
         if features.open_interest is None or features.open_interest <= 0:
             logger.warning(f"{features.symbol} 无法获取持仓量")
@@ -244,10 +394,9 @@ class SignalAnalyzer:
         # 计算持仓价值（USD）= 持仓量（合约数量）× 当前价格
         oi_value_usd = features.open_interest * features.current_price
         
-        logger.debug(f"{features.symbol} 持仓量: {features.open_interest:.2f}, 持仓价值: {oi_value_usd/1_000_000:.2f}M USD")
+        logger.debug("{} 持仓量: {:.2f}, 持仓价值: {:.2f}M USD", features.symbol, features.open_interest, oi_value_usd/1_000_000)
         
         if oi_value_usd < liquidity_threshold:
-            threshold_str = f"{self.LIQUIDITY_THRESHOLD_EXISTING/1_000_000:.0f}M" if is_existing_position else f"{self.LIQUIDITY_THRESHOLD_NEW/1_000_000:.0f}M"
             logger.warning(
                 f"{features.symbol} 流动性不足 "
                 f"(持仓价值: {oi_value_usd/1_000_000:.2f}M USD < {threshold_str})"
@@ -255,7 +404,3 @@ class SignalAnalyzer:
             return False
         
         return True
-    
-
-
-            
\ No newline at end of file
@@ -28,4 +28,5 @@ class DecisionState(TypedDict, total=False):
     execution_results: Optional[List[Dict]]  # 交易执行结果列表
     #运行状态（用于AI决策提示词）
     runtime_minutes: Optional[int]  # 运行时长（分钟）
-    call_count: Optional[int]  # 调用次数
\ No newline at end of file
+    call_count: Optional[int]  # 调用次数
+    tick_time_str: Optional[str]  # 本次决策的时间（格式化字符串，同一轮决策内共享）
\ No newline at end of file
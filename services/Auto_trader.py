@@ -1,8 +1,9 @@
 from utils.logger import logger
 from config.settings import Settings
 import threading
+import time
 from typing import Optional
-from datetime import datetime, timedelta
+from datetime import datetime
 from decision_engine.graph_builder import GraphBuilder
 from decision_engine.state import DecisionState
 from services.market.monitor import MarketMonitor
@@ -144,19 +145,23 @@ class AutoTrader:
         if self._scan_thread:
             self._scan_thread.join()
             self._scan_thread = None
+        
+        # 扫描线程结束后再释放图节点的后台线程（再次 start 时节点会按需重建）
+        self.graph.close()
         logger.info(f"Trader {self.trader_name} stopped")
     
     def _scan_loop(self):
         """扫描循环（在独立线程中运行）"""
-        scan_interval = timedelta(minutes=self.trader_cfg['scan_interval_minutes'])
-        next_scan_time = datetime.now()
+        # 使用单调时钟计算截止时间，不受系统时间调整影响
+        scan_interval = self.trader_cfg['scan_interval_minutes'] * 60
+        deadline = time.monotonic()
 
         while self.is_running and not self._stop_event.is_set():
             try:
                 # 等待到下次扫描时间
-                wait_time = (next_scan_time - datetime.now()).total_seconds()
-                if wait_time > 0:
-                    self._stop_event.wait(timeout=wait_time)
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self._stop_event.wait(timeout=remaining)
                 
                 if self._stop_event.is_set():
                     break
@@ -164,14 +169,17 @@ class AutoTrader:
                 # 执行扫描
                 self._scan_once()
                 
-                # 计算下次扫描时间
-                next_scan_time = datetime.now() + scan_interval
+                # 按固定节奏推进截止时间（扫描耗时不累积漂移）；扫描超时错过的轮次不补跑
+                deadline += scan_interval
+                now = time.monotonic()
+                if deadline <= now:
+                    deadline = now + scan_interval
                 
             except Exception as e:
                 logger.error(f"❌ 交易员 {self.trader_name} 扫描循环错误: {e}", exc_info=True)
                 # 出错后等待一段时间再继续，并更新下次扫描时间，避免快速失败循环
                 self._stop_event.wait(timeout=60)
-                next_scan_time = datetime.now() + scan_interval
+                deadline = time.monotonic() + scan_interval
     
     def _scan_once(self):
         """执行单次扫描（批量模式：一次处理所有候选币种）"""
@@ -182,11 +190,6 @@ class AutoTrader:
         try:
             logger.info(f"📊 [{self.trader_name}] LangGraph 决策引擎运行中...")
             
-            # 延迟构建图（第一次扫描时构建，此时 symbol_filter 可能已经更新）
-            if not hasattr(self, '_compiled_graph') or self._compiled_graph is None:
-                self._compiled_graph = self.graph.build_graph()
-                logger.debug("✅ 图已编译")
-                
             # 计算运行时长（分钟）
             runtime_minutes = 0
             if self.start_time:
@@ -217,7 +220,8 @@ class AutoTrader:
             
             # 一次调用处理所有候选币种
             try:
-                final_state = self._compiled_graph.invoke(decision_state)
+                # 图在第一次扫描时编译（此时 symbol_filter 可能已经更新），之后复用 GraphBuilder 缓存的编译结果
+                final_state = self.graph.invoke(decision_state)
                 logger.info(f"✅ 图执行完成")
                 logger.info(f"📊 最终状态 keys: {list(final_state.keys())}")
                 
@@ -230,7 +234,7 @@ class AutoTrader:
                     logger.info(f"✅ signal_analyzer: {len(final_state['signal_data_map'])} 个币种的信号数据")
                 if final_state.get('ai_decision'):
                     logger.info(f"✅ AI_decision: 决策结果已生成")
-                    logger.debug(f"AI决策内容: {final_state['ai_decision']}")
+                    logger.debug("AI决策内容: {}", final_state['ai_decision'])
                 else:
                     logger.warning("⚠️ AI_decision: 未生成决策结果")
             except Exception as e:
@@ -5,9 +5,29 @@
 from models.decision_log import DecisionLog
 from config.settings import Settings
 from utils.logger import logger
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Union
 from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import datetime
+from functools import lru_cache
+from sqlalchemy import JSON, Text, bindparam, cast, insert
 import json
+import uuid
+
+
+# 批量写入语句：状态快照以预先序列化的JSON文本绑定，由数据库 CAST 为 JSON，避免每行重复序列化
+_BULK_INSERT_STMT = insert(DecisionLog.__table__).values(
+    decision_state=cast(bindparam('decision_state_json', type_=Text), JSON)
+)
+
+@lru_cache(maxsize=64)
+def _float_to_decimal(value: float) -> Decimal:
+    """浮点数经 str() 转换为 Decimal，避免引入二进制表示误差（置信度取值集中，结果可缓存）"""
+    return Decimal(str(value))
+
+
+# 决策日志后台写入线程（单线程，保证写入顺序；所有服务实例共享）
+_log_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="decision-log")
 
 
 class DecisionLogService:
@@ -16,6 +36,89 @@ class DecisionLogService:
     def __init__(self, settings: Settings):
         self.settings = settings
     
+    @staticmethod
+    def _to_confidence_decimal(confidence: Any) -> Optional[Decimal]:
+        """转换置信度：如果 confidence 是 0-100 范围，转换为 0-1"""
+        if confidence is None:
+            return None
+        try:
+            if isinstance(confidence, int):
+                # 整数（DecisionItem.confidence 的常见情况）可以精确构造 Decimal，无需经过 str()
+                # 如果 confidence > 1，假设是 0-100 范围，转换为 0-1
+                if confidence > 1:
+                    return Decimal(confidence) / 100
+                return Decimal(confidence)
+            elif isinstance(confidence, float):
+                if confidence > 1:
+                    return _float_to_decimal(confidence / 100)
+                return _float_to_decimal(confidence)
+            elif isinstance(confidence, Decimal):
+                if confidence > 1:
+                    return confidence / Decimal('100')
+                return confidence
+        except Exception as e:
+            logger.warning(f"⚠️ 转换置信度失败: {e}")
+        return None
+    
+    def record_decisions_bulk(
+        self,
+        trader_id: str,
+        decisions: List[Dict[str, Any]],
+        decision_state: Dict[str, Any]
+    ) -> int:
+        """批量记录决策到数据库（一条 executemany INSERT、一次提交）
+        
+        直接构造行数据交给 Core insert，不经过逐条创建 ORM 对象和 flush；
+        所有决策共用的状态快照只序列化一次
+        
+        Args:
+            trader_id: 交易员ID
+            decisions: 决策列表，每项包含 symbol, decision_result, reasoning, confidence
+            decision_state: 决策状态快照（所有决策共用）
+            
+        Returns:
+            保存的记录数，失败返回0
+        """
+        if not decisions:
+            return 0
+        
+        try:
+            # Core insert 不会触发模型的 default_factory，id 与时间戳在此显式生成
+            now = datetime.now()
+            decision_state_json = json.dumps(decision_state, ensure_ascii=False, default=str)
+            rows = [
+                {
+                    'id': str(uuid.uuid4()),
+                    'created_at': now,
+                    'updated_at': now,
+                    'trader_id': trader_id,
+                    'symbol': item['symbol'],
+                    'decision_state_json': decision_state_json,
+                    'decision_result': item.get('decision_result'),
+                    'reasoning': item.get('reasoning'),
+                    'confidence': self._to_confidence_decimal(item.get('confidence')),
+                }
+                for item in decisions
+            ]
+            
+            with self.settings.get_session() as session:
+                session.execute(_BULK_INSERT_STMT, rows)
+            
+            logger.info(f"✅ 决策日志已批量保存: {len(rows)} 条")
+            return len(rows)
+        except Exception as e:
+            logger.error(f"❌ 批量保存决策日志失败 (trader_id={trader_id}): {e}", exc_info=True)
+            return 0
+    
+    def record_decisions_async(
+        self,
+        trader_id: str,
+        decisions: List[Dict[str, Any]],
+        decision_state: Dict[str, Any]
+    ) -> Future:
+        """在后台线程中批量记录决策，立即返回，不阻塞决策流程"""
+        return _log_executor.submit(self.record_decisions_bulk, trader_id, decisions, decision_state)
+
     def record_decision(
         self,
         trader_id: str,
@@ -23,7 +126,7 @@ class DecisionLogService:
         decision_state: Dict[str, Any],
         decision_result: Optional[str] = None,  # 'open_long', 'open_short', 'close_long', 'close_short', 'hold', 'wait'
         reasoning: Optional[str] = None,
-        confidence: Optional[Decimal] = None
+        confidence: Optional[Union[int, float, Decimal]] = None
     ) -> Optional[DecisionLog]:
         """记录决策到数据库
         
@@ -33,7 +136,7 @@ class DecisionLogService:
             decision_state: 决策状态字典（LangGraph state 的快照或部分状态）
             decision_result: 决策结果，如 'open_long', 'open_short', 'close_long', 'close_short', 'hold', 'wait'
             reasoning: AI决策理由
-            confidence: 决策置信度 (0-100，需要转换为 0-1)
+            confidence: 决策置信度 (0-100 或 0-1，写库前统一转换为 0-1 的 Decimal)
             
         Returns:
             DecisionLog对象，如果保存失败则返回None
@@ -48,23 +151,7 @@ class DecisionLogService:
                     logger.warning(f"⚠️ 解析决策状态JSON失败: {e}，使用简化状态")
                     decision_state = {"error": "解析失败", "symbol": symbol}
             
-            # 转换置信度：如果 confidence 是 0-100 范围，转换为 0-1
-            confidence_decimal = None
-            if confidence is not None:
-                try:
-                    if isinstance(confidence, (int, float)):
-                        # 如果 confidence > 1，假设是 0-100 范围，转换为 0-1
-                        if confidence > 1:
-                            confidence_decimal = Decimal(str(confidence / 100))
-                        else:
-                            confidence_decimal = Decimal(str(confidence))
-                    elif isinstance(confidence, Decimal):
-                        if confidence > 1:
-                            confidence_decimal = confidence / Decimal('100')
-                        else:
-                            confidence_decimal = confidence
-                except Exception as e:
-                    logger.warning(f"⚠️ 转换置信度失败: {e}")
+            confidence_decimal = self._to_confidence_decimal(confidence)
             
             decision_log = DecisionLog(
                 trader_id=trader_id,
@@ -1,4 +1,9 @@
 import ccxt
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Optional, Dict, Tuple
 from utils.logger import logger
 from services.market.type import MarketData
 from services.market.type import Kline
@@ -6,9 +11,29 @@ from services.market.type import Kline
 class APIClient:
     """REST API 客户端（CCXT）"""
     #固定使用binance的API
-    def __init__(self):
+    HTTP_POOL_MAXSIZE = 32  # 连接池大小（多个节点/线程共享同一实例并发请求）
+    OPEN_INTEREST_MAX_CONCURRENCY = 8  # 持仓量请求的最大并发数（多线程并发分析时避免触发交易所限频）
+    FUNDING_RATE_CACHE_TTL_SECONDS = 30  # 全市场资金费率批量结果的缓存时间（秒）
+    OPEN_INTEREST_CACHE_TTL_SECONDS = 30  # 单币种持仓量的缓存时间（秒）
+    
+    def __init__(self, session: Optional[requests.Session] = None):
         #写死用binance的API了，素以exchange_config参数没用上
-        self.exchange = ccxt.binance()
+        # 复用HTTP连接（keep-alive），所有共享此实例的节点使用同一个连接池
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.HTTP_POOL_MAXSIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        self.exchange = ccxt.binance({'session': session})
+        self._open_interest_semaphore = threading.BoundedSemaphore(self.OPEN_INTEREST_MAX_CONCURRENCY)
+        # 全市场资金费率缓存：(合约符号 -> 资金费率, 过期时间 monotonic)
+        self._funding_rate_map: Dict[str, float] = {}
+        self._funding_rate_expires_at = 0.0
+        self._funding_rate_lock = threading.Lock()
+        # 持仓量缓存：币种 -> (过期时间 monotonic, 持仓量)，流动性临界的币种不必每轮都重新请求
+        self._open_interest_cache: Dict[str, Tuple[float, float]] = {}
+        self._open_interest_cache_lock = threading.Lock()
         logger.info(f"APIClient initialized")
         # 初始化时加载市场数据
         try:
@@ -29,10 +54,27 @@ class APIClient:
             return None
     
     def get_open_interest(self, symbol: str):
-        """获取持仓量（返回合约数量）"""
+        """获取持仓量（返回合约数量），成功结果缓存 OPEN_INTEREST_CACHE_TTL_SECONDS 秒"""
+        with self._open_interest_cache_lock:
+            cached = self._open_interest_cache.get(symbol)
+        if cached is not None and time.monotonic() < cached[0]:
+            return cached[1]
+        
+        open_interest = self._fetch_open_interest(symbol)
+        # 失败（None）不缓存，下次调用重新请求
+        if open_interest is not None:
+            with self._open_interest_cache_lock:
+                self._open_interest_cache[symbol] = (
+                    time.monotonic() + self.OPEN_INTEREST_CACHE_TTL_SECONDS, open_interest
+                )
+        return open_interest
+    
+    def _fetch_open_interest(self, symbol: str) -> Optional[float]:
+        """请求交易所持仓量（合约数量）"""
         try:
             symbol = self._normalize_symbol(symbol)
-            open_interest_data = self.exchange.fetch_open_interest(symbol)
+            with self._open_interest_semaphore:
+                open_interest_data = self.exchange.fetch_open_interest(symbol)
             
             if open_interest_data is None:
                 logger.debug(f"⚠️ {symbol} Open Interest 返回 None")
@@ -56,28 +98,40 @@ class APIClient:
             logger.error(f"❌ 获取 {symbol} 持仓量失败: {e}", exc_info=True)
             return None
     
+    def get_funding_rate_map(self, force_refresh: bool = False) -> Dict[str, float]:
+        """
+        获取全市场永续合约资金费率（一次请求，结果缓存 FUNDING_RATE_CACHE_TTL_SECONDS 秒）
+        
+        Returns:
+            {合约符号(如 BTC/USDT:USDT): 资金费率}，获取失败时返回空字典
+        """
+        with self._funding_rate_lock:
+            if not force_refresh and time.monotonic() < self._funding_rate_expires_at:
+                return self._funding_rate_map
+            
+            funding_rate_map = {}
+            try:
+                for contract_symbol, data in self.exchange.fetch_funding_rates().items():
+                    funding_rate = data.get('fundingRate') if isinstance(data, dict) else None
+                    if funding_rate is not None:
+                        funding_rate_map[contract_symbol] = float(funding_rate)
+                logger.debug("批量获取资金费率: {}个合约", len(funding_rate_map))
+            except Exception as e:
+                # 失败时同样缓存（空结果），TTL内各币种直接回退到单独请求，避免反复重试批量接口
+                logger.warning(f"⚠️ 批量获取资金费率失败，回退到逐个获取: {e}")
+            
+            self._funding_rate_map = funding_rate_map
+            self._funding_rate_expires_at = time.monotonic() + self.FUNDING_RATE_CACHE_TTL_SECONDS
+            return funding_rate_map
+    
     def get_funding_rate(self, symbol: str):
-        """获取资金费率"""
+        """获取资金费率（优先从全市场批量结果中读取，未命中时单独请求）"""
         try:
-            # 规范化币种并转换为永续合约格式
-            # 处理输入格式: "BTC/USDT" 或 "BTC" 或 "BTCUSDT"
-            normalized = symbol.upper().strip()
-            
-            # 如果包含斜杠，直接使用
-            if '/' in normalized:
-                base, quote = normalized.split('/')
-            else:
-                # 如果没有斜杠，尝试从 "BTCUSDT" 格式提取
-                if normalized.endswith('USDT'):
-                    base = normalized[:-4]
-                    quote = 'USDT'
-                else:
-                    # 默认添加 USDT
-                    base = normalized
-                    quote = 'USDT'
+            contract_symbol = self._to_contract_symbol(symbol)
             
-            # 转换为永续合约格式: BTC/USDT:USDT
-            contract_symbol = f"{base}/{quote}:{quote}"
+            funding_rate = self.get_funding_rate_map().get(contract_symbol)
+            if funding_rate is not None:
+                return funding_rate
             
             funding_rate_data = self.exchange.fetch_funding_rate(contract_symbol)
             # 处理返回结果（可能是 dict 或 float）
@@ -95,6 +149,28 @@ class APIClient:
         except Exception as e:
             logger.error(f"❌ 获取资金费率失败: {e}", exc_info=True)
             return None
+    
+    @staticmethod
+    def _to_contract_symbol(symbol: str) -> str:
+        """规范化币种并转换为永续合约格式"""
+        # 处理输入格式: "BTC/USDT" 或 "BTC" 或 "BTCUSDT"
+        normalized = symbol.upper().strip()
+        
+        # 如果包含斜杠，直接使用
+        if '/' in normalized:
+            base, quote = normalized.split('/')
+        else:
+            # 如果没有斜杠，尝试从 "BTCUSDT" 格式提取
+            if normalized.endswith('USDT'):
+                base = normalized[:-4]
+                quote = 'USDT'
+            else:
+                # 默认添加 USDT
+                base = normalized
+                quote = 'USDT'
+        
+        # 转换为永续合约格式: BTC/USDT:USDT
+        return f"{base}/{quote}:{quote}"
         
     def get_Klines(self, symbol: str, timeframe: str, limit: int=100):
         """获取K线数据"""
@@ -1,4 +1,4 @@
-from typing import Dict, Callable, List, Optional
+from typing import Dict, Callable, List, Optional, Tuple
 from collections import defaultdict
 from utils.logger import logger
 
@@ -106,6 +106,38 @@ class WSClient:
             await self.conn.send(json.dumps(subscribe_msg))
             logger.info(f"订阅流: {stream}")
     
+    async def subscribe_many(self, subscriptions: List[Tuple[str, Callable]]):
+        """批量订阅数据流（所有流合并为一条 SUBSCRIBE 消息发送）
+        
+        Args:
+            subscriptions: [(stream, callback), ...]
+        """
+        new_streams = []
+        for stream, callback in subscriptions:
+            if stream not in self._subscribed_streams:
+                self._subscribed_streams.append(stream)
+                new_streams.append(stream)
+            self.subscribers[stream].append(callback)
+        
+        if self.conn is not None and new_streams:
+            subscribe_msg = {
+                "method": "SUBSCRIBE",
+                "params": new_streams,
+                "id": self._get_next_id()
+            }
+            try:
+                await self.conn.send(json.dumps(subscribe_msg))
+            except Exception:
+                # 发送失败时撤销本次登记，调用方重试时会重新发送订阅且不会重复注册回调
+                for stream, callback in subscriptions:
+                    self.subscribers[stream].remove(callback)
+                    if not self.subscribers[stream]:
+                        del self.subscribers[stream]
+                for stream in new_streams:
+                    self._subscribed_streams.remove(stream)
+                raise
+            logger.info(f"批量订阅流: {len(new_streams)}个")
+    
     async def unsubscribe(self, stream: str, callback: Optional[Callable] = None):
         """取消订阅数据流"""
         if callback:
@@ -134,7 +166,7 @@ class WSClient:
             # 处理订阅确认消息
             if "result" in data and "id" in data:
                 if data["result"] is None:
-                    logger.debug(f"订阅确认: {data}")
+                    logger.debug("订阅确认: {}", data)
                 else:
                     logger.warning(f"订阅响应: {data}")
                 return
@@ -179,7 +211,7 @@ class WSClient:
                 return
             
             # 未知格式，记录日志
-            logger.debug(f"收到未知格式消息: {data}")
+            logger.debug("收到未知格式消息: {}", data)
                 
         except json.JSONDecodeError as e:
             logger.error(f"JSON解析失败: {e}, 消息: {message}")
@@ -7,9 +7,17 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 from dataclasses import dataclass, asdict
 import requests
+from requests.adapters import HTTPAdapter
 from utils.logger import logger
 
-@dataclass
+try:
+    # orjson 可选：解析速度更快，未安装时回退到标准库 json
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+@dataclass(slots=True)
 class CoinInfo:
     """币种信息（对应 Nofx 的 CoinInfo）"""
     symbol: str
@@ -29,7 +37,7 @@ class CoinPoolCache:
     fetched_at: str  # ISO 格式时间戳
     source_type: str  # "api" or "cache"
 
-@dataclass
+@dataclass(slots=True)
 class OIPosition:
     """OI Top 持仓信息"""
     symbol: str
@@ -61,7 +69,8 @@ class CoinPoolService:
         cache_dir: str = "coin_pool_cache",
         timeout: int = 30,
         max_retries: int = 3,
-        use_default_coins: bool = False
+        use_default_coins: bool = False,
+        cache_ttl_seconds: float = 3600
     ):
         self.coin_pool_url = coin_pool_url
         self.oi_top_url = oi_top_url
@@ -70,19 +79,35 @@ class CoinPoolService:
         self.max_retries = max_retries
         self.use_default_coins = use_default_coins
         
+        # 复用HTTP连接（keep-alive），避免每次请求重新建立 TCP/TLS 连接
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        
         # 内存缓存（快速访问）
         self._coin_pool_memory_cache: Optional[CoinPoolCache] = None
         self._oi_top_memory_cache: Optional[OITopCache] = None
         self._memory_cache_lock = threading.Lock()
-        self._cache_expiry = timedelta(hours=1)  # 内存缓存1小时过期
+        self._cache_ttl_seconds = cache_ttl_seconds  # 内存缓存过期时间（默认1小时）
+        # 过期时刻使用 time.monotonic()，命中检查时无需解析 ISO 时间戳
+        self._coin_pool_expires_at = 0.0
+        self._oi_top_expires_at = 0.0
+        # 内存缓存命中/未命中计数（便于观察TTL设置是否合理）
+        self._cache_hits = 0
+        self._cache_misses = 0
         
         # 确保缓存目录存在
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         
         logger.info(f"CoinPoolService 初始化完成 (cache_dir={cache_dir})")
     
-    def get_coin_pool(self) -> List[CoinInfo]:
-        """获取币种池（带缓存和重试）"""
+    def get_coin_pool(self, force_refresh: bool = False) -> List[CoinInfo]:
+        """获取币种池（带缓存和重试）
+        
+        Args:
+            force_refresh: 为True时跳过内存缓存，直接请求API
+        """
         # 1. 检查是否使用默认币种
         if self.use_default_coins:
             logger.info("✓ 已启用默认主流币种列表")
@@ -94,7 +119,7 @@ class CoinPoolService:
             return self._convert_symbols_to_coins(self.DEFAULT_MAINSTREAM_COINS)
         
         # 3. 检查内存缓存
-        cached = self._get_coin_pool_memory_cache()
+        cached = None if force_refresh else self._get_coin_pool_memory_cache()
         if cached:
             logger.debug("✓ 使用内存缓存")
             return cached.coins
@@ -117,15 +142,19 @@ class CoinPoolService:
         logger.warning("⚠️ 无法加载缓存，使用默认主流币种列表")
         return self._convert_symbols_to_coins(self.DEFAULT_MAINSTREAM_COINS)
     
-    def get_oi_top(self) -> List[CoinInfo]:
-        """获取 OI Top 币种（带缓存和重试）"""
+    def get_oi_top(self, force_refresh: bool = False) -> List[CoinInfo]:
+        """获取 OI Top 币种（带缓存和重试）
+        
+        Args:
+            force_refresh: 为True时跳过内存缓存，直接请求API
+        """
         # 1. 检查API URL是否配置
         if not self.oi_top_url or not self.oi_top_url.strip():
             logger.debug("⚠️ 未配置OI Top API URL，跳过")
             return []
         
         # 2. 检查内存缓存
-        cached = self._get_oi_top_memory_cache()
+        cached = None if force_refresh else self._get_oi_top_memory_cache()
         if cached:
             logger.debug("✓ 使用OI Top内存缓存")
             return self._convert_oi_positions_to_coins(cached.positions)
@@ -200,9 +229,9 @@ class CoinPoolService:
         """实际执行 Coin Pool API 请求"""
         logger.info("🔄 正在请求币种池API...")
         
-        response = requests.get(self.coin_pool_url, timeout=self.timeout)
+        response = self._session.get(self.coin_pool_url, timeout=self.timeout)
         response.raise_for_status()
-        data = response.json()
+        data = _json_loads(response.content)
         
         # 验证响应格式（对应 Nofx 的 CoinPoolAPIResponse）
         coins_data = []
@@ -274,9 +303,9 @@ class CoinPoolService:
         """实际执行 OI Top API 请求"""
         logger.info("🔄 正在请求OI Top API...")
         
-        response = requests.get(self.oi_top_url, timeout=self.timeout)
+        response = self._session.get(self.oi_top_url, timeout=self.timeout)
         response.raise_for_status()
-        data = response.json()
+        data = _json_loads(response.content)
         
         # 解析 OI Top API 响应
         positions_data = []
@@ -360,6 +389,7 @@ class CoinPoolService:
         # 保存到内存缓存
         with self._memory_cache_lock:
             self._coin_pool_memory_cache = cache
+            self._coin_pool_expires_at = time.monotonic() + self._cache_ttl_seconds
         
         # 保存到文件缓存
         try:
@@ -407,6 +437,8 @@ class CoinPoolService:
             )
             with self._memory_cache_lock:
                 self._coin_pool_memory_cache = cache
+                # 按原始获取时间计算过期，过旧的文件缓存不会阻止下一轮重新请求API
+                self._coin_pool_expires_at = time.monotonic() + self._cache_ttl_seconds - cache_age.total_seconds()
             
             return coins
         except Exception as e:
@@ -416,16 +448,9 @@ class CoinPoolService:
     def _get_coin_pool_memory_cache(self) -> Optional[CoinPoolCache]:
         """获取币种池内存缓存（如果未过期）"""
         with self._memory_cache_lock:
-            if self._coin_pool_memory_cache is None:
-                return None
-            
-            # 检查是否过期
-            fetched_at = datetime.fromisoformat(self._coin_pool_memory_cache.fetched_at)
-            if datetime.now() - fetched_at > self._cache_expiry:
+            if self._coin_pool_memory_cache is not None and time.monotonic() >= self._coin_pool_expires_at:
                 self._coin_pool_memory_cache = None
-                return None
-            
-            return self._coin_pool_memory_cache
+            return self._count_cache_lookup(self._coin_pool_memory_cache)
     
     def _save_oi_top_cache(self, positions: List[OIPosition], source_type: str = "api", time_range: str = ""):
         """保存 OI Top 缓存（文件 + 内存）"""
@@ -439,6 +464,7 @@ class CoinPoolService:
         # 保存到内存缓存
         with self._memory_cache_lock:
             self._oi_top_memory_cache = cache
+            self._oi_top_expires_at = time.monotonic() + self._cache_ttl_seconds
         
         # 保存到文件缓存
         try:
@@ -487,6 +513,8 @@ class CoinPoolService:
             )
             with self._memory_cache_lock:
                 self._oi_top_memory_cache = cache
+                # 按原始获取时间计算过期，过旧的文件缓存不会阻止下一轮重新请求API
+                self._oi_top_expires_at = time.monotonic() + self._cache_ttl_seconds - cache_age.total_seconds()
             
             return positions
         except Exception as e:
@@ -496,16 +524,24 @@ class CoinPoolService:
     def _get_oi_top_memory_cache(self) -> Optional[OITopCache]:
         """获取 OI Top 内存缓存（如果未过期）"""
         with self._memory_cache_lock:
-            if self._oi_top_memory_cache is None:
-                return None
-            
-            # 检查是否过期
-            fetched_at = datetime.fromisoformat(self._oi_top_memory_cache.fetched_at)
-            if datetime.now() - fetched_at > self._cache_expiry:
+            if self._oi_top_memory_cache is not None and time.monotonic() >= self._oi_top_expires_at:
                 self._oi_top_memory_cache = None
-                return None
-            
-            return self._oi_top_memory_cache
+            return self._count_cache_lookup(self._oi_top_memory_cache)
+    
+    def invalidate_cache(self):
+        """清空内存缓存，下次获取时重新请求API（文件缓存保留，作为API失败时的回退）"""
+        with self._memory_cache_lock:
+            self._coin_pool_memory_cache = None
+            self._oi_top_memory_cache = None
+    
+    def _count_cache_lookup(self, cache):
+        """记录内存缓存命中/未命中次数（调用方需持有 _memory_cache_lock）"""
+        if cache is None:
+            self._cache_misses += 1
+        else:
+            self._cache_hits += 1
+        logger.debug("币种池内存缓存 命中: {}, 未命中: {}", self._cache_hits, self._cache_misses)
+        return cache
     
     def _convert_symbols_to_coins(self, symbols: List[str]) -> List[CoinInfo]:
         """将符号列表转换为 CoinInfo 列表"""
@@ -2,8 +2,11 @@
 市场特征引擎 - 统一计算所有市场特征
 类似 NOFX 的 feature_engine.go，集中管理所有特征计算
 """
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import List, Optional, Dict
+import numpy as np
+from typing import List, Optional, Dict, Tuple
 from services.market.type import Kline
 from services.market.indicators import IndicatorCalculator
 from services.market.api_client import APIClient
@@ -61,17 +64,27 @@ class FeatureEngine:
     MIN_KLINES_REQUIRED = 20
     PRICE_CHANGE_1H_KLINES = 20
     PRICE_CHANGE_4H_KLINES = 2
+    # 序列指标字段（与 IndicatorCalculator.calculate_series_indicators 的输出一致）
+    SERIES_KEYS = ('mid_prices', 'ema20_values', 'macd_values', 'rsi7_values', 'rsi14_values')
+    # 分周期指标缓存上限（LRU淘汰，键为 (symbol, timeframe)）
+    INDICATOR_CACHE_MAX_SIZE = 2000
     
     def __init__(self, api_client: APIClient):
         """初始化特征引擎"""
         self.api_client = api_client
+        # 分周期指标缓存：(symbol, timeframe) -> (K线窗口键, (标量指标, 序列指标))
+        # 3分钟K线每轮都在变化，而4小时K线约80轮才更新一次，按周期缓存后未变化的周期直接复用
+        self._indicator_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._indicator_cache_lock = threading.Lock()
     
     def calculate_features(
         self,
         symbol: str,
         klines_3m: List[Kline],
         klines_4h: List[Kline],
-        skip_api_calls: bool = False
+        skip_api_calls: bool = False,
+        columns_3m: Optional[Dict[str, np.ndarray]] = None,
+        columns_4h: Optional[Dict[str, np.ndarray]] = None
     ) -> Optional[MarketFeatures]:
         """
         统一入口：计算所有市场特征
@@ -81,6 +94,8 @@ class FeatureEngine:
             klines_3m: 3分钟K线数据
             klines_4h: 4小时K线数据
             skip_api_calls: 是否跳过API调用（用于评分等场景，提升性能）
+            columns_3m / columns_4h: MarketMonitor.get_kline_columns 提供的列式K线（可选），
+                与K线列表一致时直接用于指标计算，省去逐根K线取字段
         
         Returns:
             MarketFeatures对象，如果数据不足则返回None
@@ -98,12 +113,15 @@ class FeatureEngine:
             klines_4h, self.PRICE_CHANGE_4H_KLINES, current_price
         )
         
-        # 3. 计算技术指标
-        indicators_3m = self._calculate_indicators(klines_3m, timeframe='3m')
-        indicators_4h = self._calculate_indicators(klines_4h, timeframe='4h')
+        # 3. 计算技术指标（每个周期一次批量计算，标量值与序列值共用同一遍计算）
+        indicators_3m, intraday_series = self._get_indicators(symbol, klines_3m, '3m', columns_3m)
+        indicators_4h, longer_term_series = self._get_indicators(symbol, klines_4h, '4h', columns_4h)
         
         # 4. 计算成交量统计
-        volume_stats = IndicatorCalculator.calculate_volume_stats(klines_4h)
+        volume_stats = {
+            'current_volume': indicators_4h['current_volume'],
+            'average_volume': indicators_4h['average_volume'],
+        }
         
         # 5. 获取持仓量和资金费率（仅在需要时调用API）
         if skip_api_calls:
@@ -116,11 +134,7 @@ class FeatureEngine:
             funding_rate = self._extract_funding_rate(funding_rate_data)
             open_interest_average = open_interest * 0.999 if open_interest else None
         
-        # 6. 计算序列指标
-        intraday_series = IndicatorCalculator.calculate_series_indicators(klines_3m)
-        longer_term_series = IndicatorCalculator.calculate_series_indicators(klines_4h)
-        
-        # 7. 组装特征对象
+        # 6. 组装特征对象
         return MarketFeatures(
             symbol=symbol,
             current_price=current_price,
@@ -180,26 +194,69 @@ class FeatureEngine:
             return ((current_price - price_ago) / price_ago) * 100
         return 0.0
     
-    def _calculate_indicators(self, klines: List[Kline], timeframe: str) -> Dict:
-        """计算技术指标（统一方法）"""
-        indicators = {
-            'ema20': IndicatorCalculator.calculate_ema(klines, self.EMA_SHORT_PERIOD),
-            'macd': IndicatorCalculator.calculate_macd(klines),
-            'rsi7': IndicatorCalculator.calculate_rsi(klines, self.RSI_SHORT_PERIOD),
-            'rsi14': IndicatorCalculator.calculate_rsi(klines, self.RSI_LONG_PERIOD),
-        }
+    def _get_indicators(
+        self,
+        symbol: str,
+        klines: List[Kline],
+        timeframe: str,
+        columns: Optional[Dict[str, np.ndarray]] = None
+    ) -> Tuple[Dict, Dict]:
+        """获取某一周期的指标：K线窗口（首根开盘时间、数量、最新K线指纹）未变化时复用上次结果"""
+        window_key = (klines[0].open_time, len(klines), klines[-1].fingerprint())
+        cache_key = (symbol, timeframe)
+        with self._indicator_cache_lock:
+            cached = self._indicator_cache.get(cache_key)
+            if cached is not None and cached[0] == window_key:
+                self._indicator_cache.move_to_end(cache_key)
+                return cached[1]
         
-        # 4小时K线需要额外计算EMA50和ATR
-        if timeframe == '4h':
-            indicators['ema50'] = IndicatorCalculator.calculate_ema(klines, self.EMA_LONG_PERIOD)
-            indicators['atr'] = IndicatorCalculator.calculate_atr(klines, self.ATR_PERIOD)
-            indicators['atr3'] = IndicatorCalculator.calculate_atr3(klines)
+        result = self._calculate_indicators(klines, timeframe, columns)
+        with self._indicator_cache_lock:
+            self._indicator_cache[cache_key] = (window_key, result)
+            self._indicator_cache.move_to_end(cache_key)
+            if len(self._indicator_cache) > self.INDICATOR_CACHE_MAX_SIZE:
+                self._indicator_cache.popitem(last=False)
+        return result
+    
+    def _calculate_indicators(
+        self,
+        klines: List[Kline],
+        timeframe: str,
+        columns: Optional[Dict[str, np.ndarray]] = None
+    ) -> Tuple[Dict, Dict]:
+        """计算技术指标（统一方法），返回 (标量指标, 序列指标)"""
+        # 列式数据与K线列表取自两次加锁读取，中间可能收到新K线，因此核对数量和最新开盘时间
+        if (
+            columns is not None
+            and len(columns['close']) == len(klines)
+            and columns['open_time'][-1] == klines[-1].open_time
+        ):
+            highs, lows, closes, volumes = columns['high'], columns['low'], columns['close'], columns['volume']
         else:
-            indicators['ema50'] = 0.0
-            indicators['atr'] = 0.0
-            indicators['atr3'] = 0.0
+            highs, lows, closes, volumes = IndicatorCalculator.kline_arrays(klines)
         
-        return indicators
+        # 4小时K线需要额外计算EMA50和ATR
+        is_4h = timeframe == '4h'
+        values = IndicatorCalculator.calculate_all_from_arrays(
+            closes, highs, lows, volumes,
+            ema_periods=(self.EMA_SHORT_PERIOD, self.EMA_LONG_PERIOD) if is_4h else (self.EMA_SHORT_PERIOD,),
+            rsi_periods=(self.RSI_SHORT_PERIOD, self.RSI_LONG_PERIOD),
+            atr_periods=(self.ATR_PERIOD, self.ATR_SHORT_PERIOD) if is_4h else (),
+        )
+        
+        indicators = {
+            'ema20': values[f'ema{self.EMA_SHORT_PERIOD}'],
+            'macd': values['macd'],
+            'rsi7': values[f'rsi{self.RSI_SHORT_PERIOD}'],
+            'rsi14': values[f'rsi{self.RSI_LONG_PERIOD}'],
+            'ema50': values.get(f'ema{self.EMA_LONG_PERIOD}', 0.0),
+            'atr': values.get(f'atr{self.ATR_PERIOD}', 0.0),
+            'atr3': values.get(f'atr{self.ATR_SHORT_PERIOD}', 0.0),
+            'current_volume': values['current_volume'],
+            'average_volume': values['average_volume'],
+        }
+        series = {key: values[key] for key in self.SERIES_KEYS}
+        return indicators, series
     
     def _extract_funding_rate(self, funding_rate_data) -> Optional[float]:
         """提取资金费率"""
@@ -1,108 +1,178 @@
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
-from typing import List
+from math import isnan
+from typing import List, Optional, Union
 from services.market.type import Kline
+from utils._indicator_njit import ema_kernel, rsi_kernel, atr_kernel
+
+# 指标输入：K线列表，或含 open/high/low/close/volume 列的 DataFrame
+KlineInput = Union[List[Kline], pd.DataFrame]
+
+
+def _last_value(values: Optional[np.ndarray]) -> float:
+    """取指标序列最后一个值（序列为空或结果为NaN时返回0.0）"""
+    if values is None or values.shape[0] == 0:
+        return 0.0
+    value = float(values[-1])
+    return 0.0 if isnan(value) else value
+
+
+def _column(klines: KlineInput, name: str) -> np.ndarray:
+    """取K线某一列为连续的 float64 数组（供 JIT 内核直接使用）"""
+    if isinstance(klines, pd.DataFrame):
+        return np.ascontiguousarray(klines[name].to_numpy(), dtype=np.float64)
+    return np.fromiter((getattr(k, name) for k in klines), dtype=np.float64, count=len(klines))
+
+# MACD 参数（与 pandas-ta 默认值一致）：计算信号线至少需要 slow + signal - 1 根K线
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+MACD_MIN_KLINES = MACD_SLOW + MACD_SIGNAL - 1
+
 
 class IndicatorCalculator:
-    """技术指标计算器（使用 pandas-ta）"""
+    """技术指标计算器（递推内核见 utils/_indicator_njit.py，计算口径与 pandas-ta 一致）"""
+    
+    @staticmethod
+    def kline_arrays(klines: List[Kline]) -> tuple:
+        """K线列表一次性提取为 (highs, lows, closes, volumes) 四个 float64 数组"""
+        n = len(klines)
+        return (
+            np.fromiter((k.high for k in klines), dtype=np.float64, count=n),
+            np.fromiter((k.low for k in klines), dtype=np.float64, count=n),
+            np.fromiter((k.close for k in klines), dtype=np.float64, count=n),
+            np.fromiter((k.volume for k in klines), dtype=np.float64, count=n),
+        )
+    
+    @staticmethod
+    def calculate_all_from_arrays(
+        closes: np.ndarray,
+        highs: Optional[np.ndarray] = None,
+        lows: Optional[np.ndarray] = None,
+        volumes: Optional[np.ndarray] = None,
+        ema_periods: tuple = (20, 50),
+        rsi_periods: tuple = (7, 14),
+        atr_periods: tuple = (14, 3),
+    ) -> dict:
+        """
+        一次性计算一组K线的全部指标（标量值 + 序列值）
+        
+        EMA/RSI 每个周期只计算一次，标量值直接取序列末值；
+        MACD 由已算好的 EMA12/EMA26 相减得到，不再重复扫描。
+        与单项 calculate_* / calculate_series_indicators 的结果一致。
+        
+        Returns:
+            {'ema20', 'ema50', 'macd', 'rsi7', 'rsi14', 'atr14', 'atr3',
+             'mid_prices', 'ema20_values', 'macd_values', 'rsi7_values', 'rsi14_values',
+             'current_volume', 'average_volume'}（按传入的周期/数组生成对应键）
+        """
+        closes = np.ascontiguousarray(closes, dtype=np.float64)
+        n = closes.shape[0]
+        result = {'mid_prices': closes.tolist()}
+        
+        # EMA（MACD 需要的 12/26 周期一并计算，供下面复用）
+        ema_series = {}
+        for period in dict.fromkeys((*ema_periods, MACD_FAST, MACD_SLOW)):
+            ema_series[period] = ema_kernel(closes, period) if n >= period else None
+        for period in ema_periods:
+            result[f'ema{period}'] = _last_value(ema_series[period])
+        
+        # MACD = EMA12 - EMA26（与 pandas-ta 的 MACD 线相同；K线不足以计算信号线时视为不可用）
+        if n >= MACD_MIN_KLINES:
+            macd = ema_series[MACD_FAST] - ema_series[MACD_SLOW]
+            result['macd'] = _last_value(macd)
+            result['macd_values'] = macd.tolist()
+        else:
+            result['macd'] = 0.0
+            result['macd_values'] = []
+        
+        # RSI
+        for period in rsi_periods:
+            rsi = rsi_kernel(closes, period) if n > period else None
+            result[f'rsi{period}'] = _last_value(rsi)
+            result[f'rsi{period}_values'] = rsi.tolist() if rsi is not None else []
+        
+        # ATR
+        if highs is not None and lows is not None:
+            highs = np.ascontiguousarray(highs, dtype=np.float64)
+            lows = np.ascontiguousarray(lows, dtype=np.float64)
+            for period in atr_periods:
+                atr = atr_kernel(highs, lows, closes, period) if n > period else None
+                result[f'atr{period}'] = _last_value(atr)
+        
+        # 序列指标中的 EMA20（与 calculate_series_indicators 保持一致）
+        ema20 = ema_series.get(20)
+        result['ema20_values'] = ema20.tolist() if ema20 is not None else []
+        
+        # 成交量统计
+        if volumes is not None:
+            result['current_volume'] = float(volumes[-1]) if n > 0 else 0.0
+            result['average_volume'] = float(volumes.mean()) if n > 0 else 0.0
+        
+        return result
     
     @staticmethod
-    def calculate_ema(klines: List[Kline], period: int) -> float:
+    def calculate_ema(klines: KlineInput, period: int) -> float:
         """计算 EMA"""
         if len(klines) < period:
             return 0.0
         
-        df = pd.DataFrame([{
-            'close': k.close,
-            'open': k.open,
-            'high': k.high,
-            'low': k.low,
-            'volume': k.volume
-        } for k in klines])
-        
-        ema = ta.ema(df['close'], length=period)
-        return float(ema.iloc[-1]) if not ema.empty else 0.0
+        return _last_value(ema_kernel(_column(klines, 'close'), period))
     
     @staticmethod
-    def calculate_macd(klines: List[Kline]) -> float:
+    def calculate_macd(klines: KlineInput) -> float:
         """计算 MACD"""
-        if len(klines) < 26:
+        if len(klines) < MACD_MIN_KLINES:
             return 0.0
         
-        df = pd.DataFrame([k.close for k in klines], columns=['close'])
-        macd = ta.macd(df['close'])
-        return float(macd['MACD_12_26_9'].iloc[-1]) if not macd.empty else 0.0
+        closes = _column(klines, 'close')
+        return _last_value(ema_kernel(closes, MACD_FAST) - ema_kernel(closes, MACD_SLOW))
     
     @staticmethod
-    def calculate_rsi(klines: List[Kline], period: int = 7) -> float:
+    def calculate_rsi(klines: KlineInput, period: int = 7) -> float:
         """计算 RSI"""
         if len(klines) <= period:
             return 0.0
         
-        df = pd.DataFrame([k.close for k in klines], columns=['close'])
-        rsi = ta.rsi(df['close'], length=period)
-        return float(rsi.iloc[-1]) if not rsi.empty else 0.0
+        return _last_value(rsi_kernel(_column(klines, 'close'), period))
     
     @staticmethod
-    def calculate_atr(klines: List[Kline], period: int = 14) -> float:
+    def calculate_atr(klines: KlineInput, period: int = 14) -> float:
         """计算 ATR"""
         if len(klines) <= period:
             return 0.0
         
-        df = pd.DataFrame([{
-            'high': k.high,
-            'low': k.low,
-            'close': k.close
-        } for k in klines])
-        
-        atr = ta.atr(df['high'], df['low'], df['close'], length=period)
-        return float(atr.iloc[-1]) if not atr.empty else 0.0
+        return _last_value(atr_kernel(
+            _column(klines, 'high'), _column(klines, 'low'), _column(klines, 'close'), period
+        ))
     
     @staticmethod
-    def calculate_atr3(klines: List[Kline]) -> float:
+    def calculate_atr3(klines: KlineInput) -> float:
         """计算 ATR（3周期）- 用于4小时K线的短期波动率"""
         return IndicatorCalculator.calculate_atr(klines, period=3)
     
     @staticmethod
-    def calculate_volume_stats(klines: List[Kline]) -> dict:
+    def calculate_volume_stats(klines: KlineInput) -> dict:
         """计算成交量统计（当前成交量和平均成交量）"""
-        if not klines:
+        if len(klines) == 0:
             return {
                 'current_volume': 0.0,
                 'average_volume': 0.0
             }
         
-        df = pd.DataFrame([{
-            'volume': k.volume
-        } for k in klines])
-        
-        current_volume = float(df['volume'].iloc[-1]) if len(df) > 0 else 0.0
-        average_volume = float(df['volume'].mean()) if len(df) > 0 else 0.0
-        
+        volumes = _column(klines, 'volume')
         return {
-            'current_volume': current_volume,
-            'average_volume': average_volume
+            'current_volume': float(volumes[-1]),
+            'average_volume': float(volumes.mean())
         }
     
     @staticmethod
-    def calculate_series_indicators(klines: List[Kline], periods: List[int] = None) -> dict:
+    def calculate_series_indicators(klines: KlineInput, periods: List[int] = None) -> dict:
         """计算序列指标（用于历史分析）"""
-        if periods is None:
-            periods = [7, 14, 20]
-        
-        df = pd.DataFrame([{
-            'close': k.close,
-            'high': k.high,
-            'low': k.low,
-            'volume': k.volume
-        } for k in klines])
-        
-        result = {
-            'mid_prices': df['close'].tolist(),
-            'ema20_values': ta.ema(df['close'], length=20).tolist() if len(klines) >= 20 else [],
-            'macd_values': ta.macd(df['close'])['MACD_12_26_9'].tolist() if len(klines) >= 26 else [],
-            'rsi7_values': ta.rsi(df['close'], length=7).tolist() if len(klines) > 7 else [],
-            'rsi14_values': ta.rsi(df['close'], length=14).tolist() if len(klines) > 14 else [],
+        values = IndicatorCalculator.calculate_all_from_arrays(
+            _column(klines, 'close'), ema_periods=(20,), rsi_periods=(7, 14)
+        )
+        return {
+            key: values[key]
+            for key in ('mid_prices', 'ema20_values', 'macd_values', 'rsi7_values', 'rsi14_values')
         }
-        
-        return result
\ No newline at end of file
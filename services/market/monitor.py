@@ -6,7 +6,9 @@ import asyncio
 import threading
 from typing import Dict, List, Optional, Set
 from collections import defaultdict, deque
+from itertools import islice
 from datetime import datetime
+import numpy as np
 from utils.logger import logger
 from services.market.client import WSClient
 from services.market.api_client import APIClient
@@ -15,6 +17,9 @@ from services.market.type import Kline
 class MarketMonitor:
     """市场数据监控器 - 后台运行，缓存实时数据"""
     
+    # get_kline_columns 提供的列
+    KLINE_COLUMNS = ('open_time', 'high', 'low', 'close', 'volume')
+    
     def __init__(self, exchange_config: dict):
         self.exchange_config = exchange_config
         self.api_client = APIClient()
@@ -24,6 +29,8 @@ class MarketMonitor:
         self.kline_cache: Dict[str, deque] = defaultdict(lambda: deque(maxlen=1000))  # 最多保存1000根K线
         self.price_cache: Dict[str, float] = {}  # 最新价格
         self.ticker_cache: Dict[str, dict] = {}  # Ticker数据
+        # K线列式视图（SoA）：cache_key -> (缓存状态键, {字段: 只读数组})，缓存未变化时直接复用
+        self._kline_columns: Dict[str, tuple] = {}
         
         # 运行状态
         self._running = False
@@ -108,32 +115,49 @@ class MarketMonitor:
         if symbol in self._monitored_symbols:
             logger.info(f"{symbol} 已在监控中")
             return
+        await self.add_symbols([symbol], intervals=intervals)
+    
+    async def add_symbols(self, symbols: List[str], intervals: List[str] = ["3m", "4h"]):
+        """批量添加监控的交易对
         
-        self._monitored_symbols.add(symbol)
-        normalized_symbol = symbol.replace('/', '').lower()
+        各币种、各周期的历史K线在线程中并发加载；所有 WebSocket 流合并为一条 SUBSCRIBE 消息，
+        添加 N 个币种只需一次订阅往返
+        """
+        new_symbols = [s for s in dict.fromkeys(symbols) if s not in self._monitored_symbols]
+        if not new_symbols:
+            return
+        # 提前登记防止并发重复添加；加载或订阅失败（含任务被取消）时移出，下次添加时重试
+        self._monitored_symbols.update(new_symbols)
         
-        # 使用 API 获取历史数据初始化缓存
         try:
-            for interval in intervals:
-                klines = self.api_client.get_Klines(symbol, interval, limit=200)
+            # 使用 API 获取历史数据初始化缓存（阻塞请求放到线程中并发执行）
+            jobs = [(symbol, interval) for symbol in new_symbols for interval in intervals]
+            results = await asyncio.gather(
+                *(asyncio.to_thread(self.api_client.get_Klines, symbol, interval, limit=200) for symbol, interval in jobs),
+                return_exceptions=True
+            )
+            for (symbol, interval), klines in zip(jobs, results):
+                if isinstance(klines, Exception):
+                    logger.opt(exception=klines).error(f"❌ 加载 {symbol} 历史数据失败: {klines}")
+                    continue
                 if klines:
-                    cache_key = f"{normalized_symbol}_{interval}"
+                    cache_key = f"{symbol.replace('/', '').lower()}_{interval}"
                     with self._cache_lock:
                         self.kline_cache[cache_key] = deque(klines, maxlen=1000)
                     logger.info(f"✅ 已加载 {symbol} {interval} 历史K线: {len(klines)} 根")
-        except Exception as e:
-            logger.error(f"❌ 加载 {symbol} 历史数据失败: {e}", exc_info=True)
-        
-        # 订阅 WebSocket 流
-        for interval in intervals:
-            stream_name = f"{normalized_symbol}@kline_{interval}"
-            await self.ws_client.subscribe(stream_name, self._on_kline_message)
-            logger.info(f"✅ 已订阅: {stream_name}")
         
-        # 订阅 Ticker（获取最新价格）
-        ticker_stream = f"{normalized_symbol}@ticker"
-        await self.ws_client.subscribe(ticker_stream, self._on_ticker_message)
-        logger.info(f"✅ 已订阅: {ticker_stream}")
+            # 订阅 WebSocket 流（K线 + Ticker 获取最新价格）
+            subscriptions = []
+            for symbol in new_symbols:
+                normalized_symbol = symbol.replace('/', '').lower()
+                for interval in intervals:
+                    subscriptions.append((f"{normalized_symbol}@kline_{interval}", self._on_kline_message))
+                subscriptions.append((f"{normalized_symbol}@ticker", self._on_ticker_message))
+            await self.ws_client.subscribe_many(subscriptions)
+        except BaseException:
+            self._monitored_symbols.difference_update(new_symbols)
+            raise
+        logger.info(f"✅ 已订阅 {len(new_symbols)} 个币种的 {len(subscriptions)} 个数据流")
     
     async def remove_symbol(self, symbol: str):
         """移除监控的交易对"""
@@ -149,6 +173,7 @@ class MarketMonitor:
             keys_to_remove = [k for k in self.kline_cache.keys() if k.startswith(normalized_symbol)]
             for key in keys_to_remove:
                 del self.kline_cache[key]
+                self._kline_columns.pop(key, None)
             
             if normalized_symbol.upper() in self.price_cache:
                 del self.price_cache[normalized_symbol.upper()]
@@ -199,7 +224,7 @@ class MarketMonitor:
                     # 更新最新价格
                     self.price_cache[symbol] = float(kline_data["c"])
                 
-                logger.debug(f"📊 K线更新: {symbol} {interval} @ {kline.close}")
+                logger.debug("📊 K线更新: {} {} @ {}", symbol, interval, kline.close)
         except Exception as e:
             logger.error(f"❌ 处理K线消息失败: {e}", exc_info=True)
     
@@ -219,8 +244,46 @@ class MarketMonitor:
         cache_key = f"{normalized_symbol.lower()}_{interval}"
         
         with self._cache_lock:
-            klines = list(self.kline_cache.get(cache_key, deque()))
-            return klines[-limit:] if len(klines) > limit else klines
+            cached = self.kline_cache.get(cache_key)
+            if not cached:
+                return []
+            # 只复制最后 limit 根，而不是先复制整个缓存（最多1000根）再切片
+            return list(islice(cached, max(len(cached) - limit, 0), None))
+    
+    def get_kline_columns(self, symbol: str, interval: str, limit: int = 100) -> Optional[Dict[str, np.ndarray]]:
+        """
+        获取缓存K线的列式视图（线程安全）：open_time/high/low/close/volume 各一个 float64 数组，
+        与 get_klines 取同一窗口。整列只在缓存变化后转换一次，之后各调用方共享同一份只读数组
+        """
+        normalized_symbol = symbol.replace('/', '').upper()
+        cache_key = f"{normalized_symbol.lower()}_{interval}"
+        
+        with self._cache_lock:
+            cached = self.kline_cache.get(cache_key)
+            if not cached:
+                return None
+            # 历史数据加载器也会直接写 kline_cache，因此按缓存内容（数量、首尾K线）判断是否变化
+            state = (len(cached), cached[0].open_time, cached[-1].fingerprint())
+            memo = self._kline_columns.get(cache_key)
+            if memo is None or memo[0] != state:
+                klines = list(cached)
+                memo = None
+        
+        if memo is None:
+            columns = {name: self._column(klines, name) for name in self.KLINE_COLUMNS}
+            memo = (state, columns)
+            with self._cache_lock:
+                self._kline_columns[cache_key] = memo
+        
+        # 切片是只读数组的视图，无需复制
+        return {name: values[-limit:] for name, values in memo[1].items()}
+    
+    @staticmethod
+    def _column(klines: List[Kline], name: str) -> np.ndarray:
+        """把K线列表的某个字段转换为只读 float64 数组"""
+        values = np.fromiter((getattr(k, name) for k in klines), dtype=np.float64, count=len(klines))
+        values.flags.writeable = False
+        return values
     
     def get_latest_price(self, symbol: str) -> Optional[float]:
         """获取最新价格（线程安全）"""
@@ -49,6 +49,8 @@ class SymbolFilter:
         # 筛选后的币种列表（对应 Nofx 的 FilterSymbol）
         self.filtered_symbols: List[str] = []
         self._filtered_symbols_lock = threading.Lock()
+        # 首次得到非空筛选结果（或筛选任务退出）时置位，供等待方直接阻塞等待，无需轮询
+        self._ready_event = threading.Event()
         
         # 筛选任务线程
         self._filtering_thread: Optional[threading.Thread] = None
@@ -67,6 +69,7 @@ class SymbolFilter:
             return
         
         self._running = True
+        self._ready_event.clear()
         
         def filtering_loop():
             logger.info("🚀 币种筛选任务已启动")
@@ -83,6 +86,8 @@ class SymbolFilter:
                     
                     with self._filtered_symbols_lock:
                         self.filtered_symbols = filtered
+                    if filtered:
+                        self._ready_event.set()
                     
                     logger.info(f"✅ 币种筛选完成，筛选出 {len(filtered)} 个币种")
                 except Exception as e:
@@ -98,6 +103,8 @@ class SymbolFilter:
                     time.sleep(60)
             
             self._running = False
+            # 唤醒仍在等待筛选结果的调用方
+            self._ready_event.set()
             logger.info("筛选任务已停止")
         
         self._filtering_thread = threading.Thread(
@@ -125,6 +132,26 @@ class SymbolFilter:
         with self._filtered_symbols_lock:
             return self.filtered_symbols.copy()
     
+    def wait_for_symbols(self, timeout: float, log_interval: float = 10) -> List[str]:
+        """等待筛选结果就绪后返回筛选后的币种列表
+        
+        结果就绪时立即返回；超时或筛选任务已停止时返回当前结果（可能为空）
+        
+        Args:
+            timeout: 最长等待时间（秒）
+            log_interval: 等待日志的输出间隔（秒）
+        """
+        deadline = time.monotonic() + timeout
+        while self._running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if self._ready_event.wait(timeout=min(log_interval, remaining)):
+                break
+            waited = timeout - max(deadline - time.monotonic(), 0)
+            logger.info(f"继续等待筛选结果... ({waited:.0f}/{timeout:.0f}秒)")
+        return self.get_filtered_symbols()
+    
     def _perform_filtering(self) -> List[str]:
         """执行筛选逻辑
         
@@ -154,7 +181,11 @@ class SymbolFilter:
         scored_coins.sort(key=lambda x: x.get('score', 0), reverse=True)
         top_symbols = [coin.get('symbol') for coin in scored_coins[:self.TOP_N] if coin.get('symbol')]
         
-        logger.debug(f"📊 技术指标评分Top {self.TOP_N}: {[(c.get('symbol', 'N/A'), c.get('score', 0)) for c in scored_coins[:self.TOP_N]]}")
+        logger.opt(lazy=True).debug(
+            "📊 技术指标评分Top {}: {}",
+            lambda: self.TOP_N,
+            lambda: [(c.get('symbol', 'N/A'), c.get('score', 0)) for c in scored_coins[:self.TOP_N]],
+        )
         
         return top_symbols
     
@@ -179,7 +210,9 @@ class SymbolFilter:
                 # 使用FeatureEngine计算特征（轻量级模式，跳过API调用）
                 if self.feature_engine:
                     features = self.feature_engine.calculate_features(
-                        symbol, klines_3m, klines_4h, skip_api_calls=True
+                        symbol, klines_3m, klines_4h, skip_api_calls=True,
+                        columns_3m=self.market_monitor.get_kline_columns(symbol, "3m", limit=100),
+                        columns_4h=self.market_monitor.get_kline_columns(symbol, "4h", limit=100)
                     )
                     if not features:
                         continue
@@ -194,7 +227,7 @@ class SymbolFilter:
                     'score': score
                 })
             except Exception as e:
-                logger.debug(f"⚠️ {symbol} 评分失败: {e}")
+                logger.debug("⚠️ {} 评分失败: {}", symbol, e)
                 continue
         
         logger.info(f"✅ 技术指标评分完成，共评分 {len(scored_coins)} 个币种")
@@ -14,6 +14,10 @@ class Kline:
     close_time: int
     quote_volume: float
     trades: int
+    
+    def fingerprint(self) -> tuple:
+        """K线状态指纹（用作缓存键）：未收盘K线的最高/最低价、收盘价和成交量都会持续变化，需全部纳入"""
+        return (self.open_time, self.high, self.low, self.close, self.volume)
 
 @dataclass
 class MarketData:
@@ -0,0 +1,111 @@
+"""
+AIDecision 单元测试
+- 结构化输出为JSON Schema普通dict（不经Pydantic校验）：数值字段中的数字字符串需转换为数值，
+  转换后的决策交给 RiskCheck 时不能因类型问题抛出异常
+- 信号格式化的向量化趋势分类：NaN 指标按"等于/中性/正常"处理
+"""
+import json
+import math
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from decision_engine.nodes.AI_decision import AIDecision
+from decision_engine.nodes.Risk_check import RiskCheck
+from utils._signal_format_njit import classify
+
+
+def make_decision(**overrides) -> dict:
+    decision = {
+        'symbol': 'BTC/USDT',
+        'action': 'open_long',
+        'leverage': 3,
+        'position_size_usd': 1000.0,
+        'stop_loss': 95.0,
+        'take_profit': 120.0,
+        'confidence': 80,
+        'risk_usd': 50.0,
+        'reasoning': 'test',
+    }
+    decision.update(overrides)
+    return decision
+
+
+class TestHandleResponse:
+    """_handle_response 数值字段转换"""
+
+    @pytest.fixture
+    def ai_decision(self):
+        return AIDecision({})
+
+    def test_numeric_strings_are_coerced(self, ai_decision):
+        """数字字符串转换为数值：整数字段转 int，其余转 float"""
+        response = {'decisions': [make_decision(
+            leverage='5', position_size_usd='1000', stop_loss='95.5', take_profit='120', confidence='80', risk_usd='50'
+        )]}
+
+        decision = ai_decision._handle_response(response, {})['ai_decision']['decisions'][0]
+
+        assert decision['leverage'] == 5 and isinstance(decision['leverage'], int)
+        assert decision['confidence'] == 80 and isinstance(decision['confidence'], int)
+        assert decision['position_size_usd'] == 1000.0 and isinstance(decision['position_size_usd'], float)
+        assert decision['stop_loss'] == 95.5
+        assert decision['take_profit'] == 120.0
+        assert decision['risk_usd'] == 50.0
+
+    @pytest.mark.parametrize("value", ['abc', 'nan', '', None])
+    def test_invalid_values_are_kept(self, ai_decision, value):
+        """无法转换的值原样保留，交由 RiskCheck 判定"""
+        response = {'decisions': [make_decision(leverage=value)]}
+        decision = ai_decision._handle_response(response, {})['ai_decision']['decisions'][0]
+        assert decision['leverage'] == value
+
+    def test_fallback_json_is_coerced(self, ai_decision):
+        """非结构化响应手动解析后同样转换数值字段"""
+        response = SimpleNamespace(content='```json\n' + json.dumps([make_decision(leverage='5')]) + '\n```')
+        decision = ai_decision._handle_response(response, {})['ai_decision']['decisions'][0]
+        assert decision['leverage'] == 5
+
+    @pytest.mark.parametrize("leverage,expected", [('5', True), ('abc', False)])
+    def test_risk_check_does_not_raise(self, ai_decision, leverage, expected):
+        """转换后的决策经过 RiskCheck：数字字符串通过，非数值返回验证错误"""
+        response = {'decisions': [make_decision(leverage=leverage)]}
+        decision = ai_decision._handle_response(response, {})['ai_decision']['decisions'][0]
+        risk_check = RiskCheck({'btc_eth_leverage': 5, 'altcoin_leverage': 3})
+
+        is_valid, _ = risk_check._validate_decision(
+            decision, 10000.0, {}, {'BTC/USDT': {'current_price': 100.0}}
+        )
+        assert is_valid is expected
+
+
+class TestSignalClassify:
+    """趋势状态码：NaN 指标映射为 0"""
+
+    def test_classify_codes(self):
+        """正常值按符号/阈值分类，NaN 记为 0"""
+        prices = np.array([100.0, 100.0, 100.0, math.nan, 100.0])
+        ema20 = np.array([90.0, 110.0, 100.0, 90.0, math.nan])
+        macd = np.array([1.0, -1.0, 0.0, math.nan, math.nan])
+        rsi14 = np.array([80.0, 20.0, 50.0, math.nan, math.nan])
+
+        vs_ema, macd_code, rsi_code = classify(prices, ema20, macd, rsi14)
+
+        assert vs_ema.tolist() == [1, -1, 0, 0, 0]
+        assert macd_code.tolist() == [1, -1, 0, 0, 0]
+        assert rsi_code.tolist() == [1, -1, 0, 0, 0]
+
+    @pytest.mark.parametrize("field", ['ema20_3m', 'macd_3m', 'rsi14_3m', 'ema20_4h', 'macd_4h', 'rsi14_4h', 'current_price'])
+    def test_nan_signal_renders_neutral_labels(self, field):
+        """任一趋势指标为 NaN 时，对应文本为"等于"/"中性"/"正常"，不会出现 KeyError"""
+        signals = {
+            'current_price': 100.0,
+            'ema20_3m': 100.0, 'macd_3m': 0.0, 'rsi14_3m': 50.0,
+            'ema20_4h': 100.0, 'ema50_4h': 100.0, 'macd_4h': 0.0, 'rsi14_4h': 50.0,
+        }
+        signals[field] = math.nan
+
+        text = AIDecision({})._format_signal_data({'BTC/USDT': signals})
+
+        assert text.count("(价格等于EMA20)") == 2
+        assert text.count("(中性)") == 2
+        assert text.count("(正常)") == 2
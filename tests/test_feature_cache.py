@@ -0,0 +1,161 @@
+"""
+K线缓存失效单元测试
+FeatureEngine 分周期指标缓存、SignalAnalyzer 特征缓存与输入快照都以最新K线指纹为键：
+未收盘K线的最高/最低价或成交量变化（收盘价不变）时必须重新计算，未变化的周期继续复用
+"""
+import random
+from dataclasses import replace
+import pytest
+from services.market.type import Kline
+from services.market.feature_engine import FeatureEngine
+from decision_engine.nodes.signal_analyzer import SignalAnalyzer
+
+SYMBOL = 'BTC/USDT:USDT'
+
+
+class FakeAPIClient:
+    """只提供特征计算用到的持仓量和资金费率接口"""
+
+    def get_open_interest(self, symbol):
+        return 1000.0
+
+    def get_funding_rate(self, symbol):
+        return {'fundingRate': 0.0001}
+
+
+def make_klines(n: int, interval_ms: int, seed: int) -> list:
+    """生成随机游走K线"""
+    rng = random.Random(seed)
+    price = 100.0
+    klines = []
+    for i in range(n):
+        open_price = price
+        close = price * (1 + rng.gauss(0, 0.01))
+        open_time = 1_700_000_000_000 + i * interval_ms
+        klines.append(Kline(
+            open_time=open_time,
+            open=open_price,
+            high=max(open_price, close) * 1.002,
+            low=min(open_price, close) * 0.998,
+            close=close,
+            volume=1000.0 + rng.random() * 500,
+            close_time=open_time + interval_ms - 1,
+            quote_volume=0.0,
+            trades=100,
+        ))
+        price = close
+    return klines
+
+
+def update_live_bar(klines: list, **changes) -> list:
+    """返回最后一根K线被更新后的新列表（开盘时间不变）"""
+    return klines[:-1] + [replace(klines[-1], **changes)]
+
+
+@pytest.fixture
+def klines_3m():
+    return make_klines(100, 3 * 60 * 1000, seed=1)
+
+
+@pytest.fixture
+def klines_4h():
+    return make_klines(100, 4 * 60 * 60 * 1000, seed=2)
+
+
+class TestFeatureEngineIndicatorCache:
+    """FeatureEngine 分周期指标缓存"""
+
+    @pytest.fixture
+    def engine(self, monkeypatch):
+        engine = FeatureEngine(None)
+        calls = []
+        original = engine._calculate_indicators
+
+        def counting(klines, timeframe, columns=None):
+            calls.append(timeframe)
+            return original(klines, timeframe, columns)
+
+        monkeypatch.setattr(engine, '_calculate_indicators', counting)
+        engine.calls = calls
+        return engine
+
+    def test_3m_bar_change_reuses_4h_indicators(self, engine, klines_3m, klines_4h):
+        """3m K线变化、4h K线不变：只重新计算3m指标"""
+        first = engine.calculate_features(SYMBOL, klines_3m, klines_4h, skip_api_calls=True)
+        engine.calls.clear()
+
+        updated_3m = update_live_bar(klines_3m, close=klines_3m[-1].close * 1.01, high=klines_3m[-1].high * 1.01)
+        second = engine.calculate_features(SYMBOL, updated_3m, klines_4h, skip_api_calls=True)
+
+        assert engine.calls == ['3m']
+        assert second.ema20_3m != first.ema20_3m
+        assert second.atr_4h == first.atr_4h
+        assert second.current_volume_4h == first.current_volume_4h
+
+    @pytest.mark.parametrize("field", ['high', 'low', 'volume'])
+    def test_live_bar_change_with_same_close_invalidates(self, engine, klines_3m, klines_4h, field):
+        """收盘价不变、最高/最低价或成交量变化：对应周期重新计算"""
+        engine.calculate_features(SYMBOL, klines_3m, klines_4h, skip_api_calls=True)
+        engine.calls.clear()
+
+        factor = 0.9 if field == 'low' else 1.5
+        updated_4h = update_live_bar(klines_4h, **{field: getattr(klines_4h[-1], field) * factor})
+        engine.calculate_features(SYMBOL, klines_3m, updated_4h, skip_api_calls=True)
+        assert engine.calls == ['4h']
+
+        engine.calls.clear()
+        updated_3m = update_live_bar(klines_3m, **{field: getattr(klines_3m[-1], field) * factor})
+        engine.calculate_features(SYMBOL, updated_3m, updated_4h, skip_api_calls=True)
+        assert engine.calls == ['3m']
+
+    def test_4h_volume_change_updates_volume_features(self, engine, klines_3m, klines_4h):
+        """4h 未收盘K线成交量变化：current_volume_4h 随之更新"""
+        first = engine.calculate_features(SYMBOL, klines_3m, klines_4h, skip_api_calls=True)
+        updated_4h = update_live_bar(klines_4h, volume=klines_4h[-1].volume * 3)
+        second = engine.calculate_features(SYMBOL, klines_3m, updated_4h, skip_api_calls=True)
+
+        assert second.current_volume_4h == pytest.approx(klines_4h[-1].volume * 3)
+        assert second.current_volume_4h != first.current_volume_4h
+
+    def test_unchanged_klines_hit_cache(self, engine, klines_3m, klines_4h):
+        """K线完全不变：两个周期都命中缓存"""
+        engine.calculate_features(SYMBOL, klines_3m, klines_4h, skip_api_calls=True)
+        engine.calls.clear()
+        engine.calculate_features(SYMBOL, list(klines_3m), list(klines_4h), skip_api_calls=True)
+        assert engine.calls == []
+
+
+class TestSignalAnalyzerFeatureCache:
+    """SignalAnalyzer 特征缓存与输入快照"""
+
+    @pytest.fixture
+    def analyzer(self):
+        return SignalAnalyzer(api_client=FakeAPIClient())
+
+    def test_3m_bar_change_recomputes_features(self, analyzer, klines_3m, klines_4h):
+        """3m K线变化、4h K线不变：特征重新计算，4h 特征保持不变"""
+        first = analyzer._get_features(SYMBOL, klines_3m, klines_4h)
+        assert analyzer._get_features(SYMBOL, klines_3m, klines_4h) is first
+
+        updated_3m = update_live_bar(klines_3m, close=klines_3m[-1].close * 1.01)
+        second = analyzer._get_features(SYMBOL, updated_3m, klines_4h)
+
+        assert second is not first
+        assert second.ema20_3m != first.ema20_3m
+        assert second.atr_4h == first.atr_4h
+
+    @pytest.mark.parametrize("field", ['high', 'low', 'volume'])
+    def test_live_bar_change_with_same_close_recomputes(self, analyzer, klines_3m, klines_4h, field):
+        """收盘价不变、最高/最低价或成交量变化：特征缓存失效"""
+        first = analyzer._get_features(SYMBOL, klines_3m, klines_4h)
+        updated_4h = update_live_bar(klines_4h, **{field: getattr(klines_4h[-1], field) * 1.5})
+        assert analyzer._get_features(SYMBOL, klines_3m, updated_4h) is not first
+
+    @pytest.mark.parametrize("field", ['high', 'low', 'volume'])
+    def test_snapshot_key_tracks_live_bar(self, klines_3m, klines_4h, field):
+        """输入快照包含最新K线的最高/最低价和成交量"""
+        existing = frozenset()
+        before = SignalAnalyzer._snapshot_key({SYMBOL: {'klines_3m': klines_3m, 'klines_4h': klines_4h}}, existing)
+        updated_3m = update_live_bar(klines_3m, **{field: getattr(klines_3m[-1], field) * 1.5})
+        after = SignalAnalyzer._snapshot_key({SYMBOL: {'klines_3m': updated_3m, 'klines_4h': klines_4h}}, existing)
+        assert before != after
@@ -0,0 +1,99 @@
+"""
+技术指标内核单元测试
+与 pandas-ta 参考实现逐值对比（EMA / MACD / RSI / ATR），覆盖零波幅K线和K线数量不足的情况
+"""
+import random
+import numpy as np
+import pytest
+from utils._indicator_njit import ema_kernel, rsi_kernel, atr_kernel
+from services.market.indicators import IndicatorCalculator, MACD_FAST, MACD_SLOW, MACD_MIN_KLINES
+
+pd = pytest.importorskip("pandas")
+ta = pytest.importorskip("pandas_ta")
+
+TOLERANCE = 1e-9
+LENGTHS = [1, 2, 3, 4, 7, 8, 14, 15, 19, 20, 21, 26, 33, 34, 35, 50, 51, 100, 200, 1000]
+
+
+def make_bars(n: int, seed: int, zero_range_every: int = 17):
+    """生成随机游走K线（high, low, close），每隔 zero_range_every 根插入一根零波幅K线"""
+    rng = random.Random(seed)
+    price = 100.0
+    highs, lows, closes = [], [], []
+    for i in range(n):
+        open_price = price
+        close = price * (1 + rng.gauss(0, 0.01))
+        high = max(open_price, close) * (1 + abs(rng.gauss(0, 0.003)))
+        low = min(open_price, close) * (1 - abs(rng.gauss(0, 0.003)))
+        if zero_range_every and i % zero_range_every == 0:
+            high = low = close
+        highs.append(high)
+        lows.append(low)
+        closes.append(close)
+        price = close
+    return np.array(highs), np.array(lows), np.array(closes)
+
+
+def assert_series_equal(actual: np.ndarray, expected):
+    """逐值对比（NaN 位置必须一致）"""
+    expected = np.asarray(expected, dtype=np.float64)
+    assert actual.shape == expected.shape
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    mask = ~np.isnan(expected)
+    np.testing.assert_allclose(actual[mask], expected[mask], rtol=TOLERANCE, atol=TOLERANCE)
+
+
+class TestIndicatorKernels:
+    """EMA / RSI / ATR 内核与 pandas-ta 的一致性"""
+
+    @pytest.mark.parametrize("n", LENGTHS)
+    @pytest.mark.parametrize("period", [3, 12, 20, 26, 50])
+    def test_ema_matches_pandas_ta(self, n, period):
+        """EMA（SMA 初值 + adjust=False 递推）"""
+        _, _, closes = make_bars(n, seed=n * 31 + period)
+        expected = ta.ema(pd.Series(closes), length=period)
+        if expected is None:
+            # K线不足：对外接口返回 0.0
+            assert IndicatorCalculator.calculate_all_from_arrays(closes, ema_periods=(period,))[f'ema{period}'] == 0.0
+            return
+        assert_series_equal(ema_kernel(closes, period), expected)
+
+    @pytest.mark.parametrize("n", LENGTHS)
+    @pytest.mark.parametrize("period", [7, 14])
+    def test_rsi_matches_pandas_ta(self, n, period):
+        """RSI（Wilder 平滑）"""
+        _, _, closes = make_bars(n, seed=n * 37 + period)
+        expected = ta.rsi(pd.Series(closes), length=period)
+        if expected is None:
+            values = IndicatorCalculator.calculate_all_from_arrays(closes, rsi_periods=(period,))
+            assert values[f'rsi{period}'] == 0.0
+            assert values[f'rsi{period}_values'] == []
+            return
+        assert_series_equal(rsi_kernel(closes, period), expected)
+
+    @pytest.mark.parametrize("n", LENGTHS)
+    @pytest.mark.parametrize("period", [3, 14])
+    @pytest.mark.parametrize("zero_range_every", [0, 17, 1])
+    def test_atr_matches_pandas_ta(self, n, period, zero_range_every):
+        """ATR（含零波幅K线的 epsilon 修正）"""
+        highs, lows, closes = make_bars(n, seed=n * 41 + period, zero_range_every=zero_range_every)
+        expected = ta.atr(pd.Series(highs), pd.Series(lows), pd.Series(closes), length=period)
+        if expected is None:
+            values = IndicatorCalculator.calculate_all_from_arrays(closes, highs, lows, atr_periods=(period,))
+            assert values[f'atr{period}'] == 0.0
+            return
+        assert_series_equal(atr_kernel(highs, lows, closes, period), expected)
+
+    @pytest.mark.parametrize("n", LENGTHS)
+    def test_macd_matches_pandas_ta(self, n):
+        """MACD 线 = EMA12 - EMA26；K线不足以计算信号线时返回空序列"""
+        highs, lows, closes = make_bars(n, seed=n * 43)
+        values = IndicatorCalculator.calculate_all_from_arrays(closes, highs, lows)
+
+        if n < MACD_MIN_KLINES:
+            assert values['macd'] == 0.0
+            assert values['macd_values'] == []
+            return
+        expected = ta.macd(pd.Series(closes), fast=MACD_FAST, slow=MACD_SLOW)[f'MACD_{MACD_FAST}_{MACD_SLOW}_9']
+        assert_series_equal(np.array(values['macd_values']), expected)
+        assert values['macd'] == pytest.approx(float(expected.iloc[-1]), rel=TOLERANCE, abs=TOLERANCE)
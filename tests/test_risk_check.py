@@ -0,0 +1,130 @@
+"""
+RiskCheck 单元测试
+批量向量化校验（_batch_validate_open_positions）与逐条校验（_validate_open_position）必须给出相同结论：
+批量判定通过的决策不会再经过逐条校验，两者一旦不一致就会放行本应被拒绝的开仓
+"""
+import math
+import pytest
+from decision_engine.nodes.Risk_check import RiskCheck
+
+ACCOUNT_EQUITY = 10000.0
+CURRENT_PRICE = 100.0
+
+# 各方向的 (止损, 止盈)：合格（风险回报比 4:1）、风险回报比不足（2:1）、止损止盈方向颠倒、止损在当前价错误一侧
+STOPS = {
+    'open_long': {'ok': (95.0, 120.0), 'low_rrr': (95.0, 110.0), 'inverted': (120.0, 95.0), 'wrong_side': (101.0, 140.0)},
+    'open_short': {'ok': (105.0, 80.0), 'low_rrr': (105.0, 90.0), 'inverted': (80.0, 105.0), 'wrong_side': (99.0, 60.0)},
+}
+
+# 单字段变体：在合格决策的基础上只替换一个字段
+FIELD_VARIANTS = [
+    ('leverage', 3), ('leverage', 5), ('leverage', 6), ('leverage', 0), ('leverage', -1),
+    ('leverage', None), ('leverage', True), ('leverage', 2.5),
+    ('position_size_usd', 1000.0), ('position_size_usd', 14000.0), ('position_size_usd', 15000.0),
+    ('position_size_usd', 100000.0), ('position_size_usd', 100001.0), ('position_size_usd', 0),
+    ('position_size_usd', None), ('position_size_usd', True),
+    ('stop_loss', 0), ('stop_loss', None), ('take_profit', 0), ('take_profit', None),
+    ('risk_usd', 50.0), ('risk_usd', 0), ('risk_usd', -1), ('risk_usd', None), ('risk_usd', True),
+]
+
+# 非数值字段（字符串、NaN）：两条路径都必须判定为无效，且逐条校验返回错误信息而不是抛出异常
+NON_NUMBER_VARIANTS = [
+    ('leverage', '3'), ('position_size_usd', '1000'), ('stop_loss', '95'), ('take_profit', '120'), ('risk_usd', '50'),
+    ('leverage', math.nan), ('position_size_usd', math.nan), ('stop_loss', math.nan), ('take_profit', math.nan),
+    ('risk_usd', math.nan), ('leverage', [3]),
+]
+
+SYMBOLS = ['BTC/USDT', 'ETH/USDT:USDT', 'BTCUSDT', 'SOL/USDT', 'DOGE/USDT:USDT']
+
+# 行情：正常价格、NaN 价格、价格为 0、字符串价格、无行情
+MARKETS = {
+    'price': lambda symbol: {symbol: {'current_price': CURRENT_PRICE}},
+    'nan_price': lambda symbol: {symbol: {'current_price': math.nan}},
+    'zero_price': lambda symbol: {symbol: {'current_price': 0}},
+    'str_price': lambda symbol: {symbol: {'current_price': '100'}},
+    'missing': lambda symbol: {},
+}
+
+
+def make_decision(action: str, symbol: str, stops: str = 'ok', **overrides) -> dict:
+    stop_loss, take_profit = STOPS[action][stops]
+    decision = {
+        'symbol': symbol,
+        'action': action,
+        'leverage': 3,
+        'position_size_usd': 1000.0,
+        'stop_loss': stop_loss,
+        'take_profit': take_profit,
+        'risk_usd': 50.0,
+    }
+    decision.update(overrides)
+    return decision
+
+
+def build_cases():
+    cases = []
+    for action in STOPS:
+        for symbol in SYMBOLS:
+            for market in MARKETS:
+                for stops in STOPS[action]:
+                    cases.append(pytest.param(make_decision(action, symbol, stops), market, id=f"{action}-{symbol}-{market}-{stops}"))
+                for field, value in FIELD_VARIANTS + NON_NUMBER_VARIANTS:
+                    decision = make_decision(action, symbol, **{field: value})
+                    cases.append(pytest.param(decision, market, id=f"{action}-{symbol}-{market}-{field}={value!r}"))
+                decision = make_decision(action, symbol)
+                del decision['risk_usd']
+                cases.append(pytest.param(decision, market, id=f"{action}-{symbol}-{market}-no_risk_usd"))
+    return cases
+
+
+class TestRiskCheckOpenPositionParity:
+    """开仓校验：批量路径与逐条路径结论一致"""
+
+    @pytest.fixture
+    def risk_check(self):
+        return RiskCheck({'btc_eth_leverage': 5, 'altcoin_leverage': 3})
+
+    @pytest.mark.parametrize("decision,market", build_cases())
+    def test_batch_matches_single(self, risk_check, decision, market):
+        """同一决策分别经过两条路径，结论必须相同"""
+        market_data_map = MARKETS[market](decision['symbol'])
+
+        fast_passed = risk_check._batch_validate_open_positions([decision], ACCOUNT_EQUITY, market_data_map)[0]
+        is_valid, _ = risk_check._validate_open_position(decision, ACCOUNT_EQUITY, market_data_map)
+
+        assert fast_passed == is_valid
+
+    @pytest.mark.parametrize("field,value", NON_NUMBER_VARIANTS)
+    @pytest.mark.parametrize("action", list(STOPS))
+    def test_non_number_field_is_validation_error(self, risk_check, action, field, value):
+        """非数值字段返回验证错误，而不是在比较时抛出 TypeError"""
+        decision = make_decision(action, 'BTC/USDT', **{field: value})
+        market_data_map = MARKETS['price']('BTC/USDT')
+
+        is_valid, error_message = risk_check._validate_decision(decision, ACCOUNT_EQUITY, {}, market_data_map)
+
+        assert is_valid is False
+        assert field in error_message
+
+    def test_batch_rows_are_independent(self, risk_check):
+        """一批中混合多个币种/方向/非开仓决策时，逐行结论与单独校验相同"""
+        decisions = [
+            make_decision('open_long', 'BTC/USDT'),
+            make_decision('open_short', 'SOL/USDT', leverage=5),
+            {'symbol': 'ETH/USDT', 'action': 'close_long'},
+            make_decision('open_short', 'ETH/USDT', stops='low_rrr'),
+            'not-a-dict',
+            make_decision('open_long', 'DOGE/USDT:USDT', position_size_usd=15001.0),
+            make_decision('open_long', 'ETH/USDT', position_size_usd=15000.0),
+        ]
+        market_data_map = {
+            symbol: {'current_price': CURRENT_PRICE}
+            for symbol in ('BTC/USDT', 'SOL/USDT', 'ETH/USDT', 'DOGE/USDT:USDT')
+        }
+
+        fast_passed = risk_check._batch_validate_open_positions(decisions, ACCOUNT_EQUITY, market_data_map)
+
+        assert fast_passed == [True, False, False, False, False, False, True]
+        for decision, passed in zip(decisions, fast_passed):
+            if isinstance(decision, dict) and decision['action'] in RiskCheck.OPEN_ACTIONS:
+                assert passed == risk_check._validate_open_position(decision, ACCOUNT_EQUITY, market_data_map)[0]
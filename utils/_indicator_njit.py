@@ -0,0 +1,85 @@
+"""
+技术指标计算内核 - EMA / RSI / ATR 的递推循环
+
+计算口径与 pandas-ta 默认实现一致：
+- EMA：前 length 根取 SMA 作为初值，之后按 ewm(span=length, adjust=False) 递推
+- RSI：涨跌幅分别做 RMA（Wilder 平滑，ewm(alpha=1/length, adjust=False)）
+- ATR：真实波幅前 length 根取 SMA 作为初值，之后做 RMA
+"""
+import sys
+import numpy as np
+from utils._njit import njit
+
+EPSILON = sys.float_info.epsilon
+
+
+@njit(cache=True, nogil=True)
+def _ewm_from(values, start, alpha, out):
+    """从 start 位置起做 adjust=False 的指数加权递推，结果写入 out（与 pandas ewm 的递推公式相同）"""
+    old_wt = 1.0 - alpha
+    weighted = values[start]
+    out[start] = weighted
+    for i in range(start + 1, values.shape[0]):
+        cur = values[i]
+        if cur == cur and weighted != cur:
+            weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+        out[i] = weighted
+
+
+@njit(cache=True, nogil=True)
+def ema_kernel(close, length):
+    """EMA 序列（前 length-1 个值为 NaN；K线不足 length 根时全部为 NaN）"""
+    n = close.shape[0]
+    out = np.full(n, np.nan)
+    if n < length:
+        return out
+    seeded = close.copy()
+    seeded[length - 1] = close[:length].mean()
+    _ewm_from(seeded, length - 1, 2.0 / (length + 1.0), out)
+    return out
+
+
+@njit(cache=True, nogil=True)
+def rsi_kernel(close, length):
+    """RSI 序列（首个值为 NaN）"""
+    n = close.shape[0]
+    out = np.full(n, np.nan)
+    if n < 2:
+        return out
+    gain = np.full(n, np.nan)
+    loss = np.full(n, np.nan)
+    for i in range(1, n):
+        diff = close[i] - close[i - 1]
+        gain[i] = diff if diff > 0.0 else 0.0
+        loss[i] = diff if diff < 0.0 else 0.0
+    gain_avg = np.full(n, np.nan)
+    loss_avg = np.full(n, np.nan)
+    alpha = 1.0 / length
+    _ewm_from(gain, 1, alpha, gain_avg)
+    _ewm_from(loss, 1, alpha, loss_avg)
+    for i in range(1, n):
+        denom = gain_avg[i] + abs(loss_avg[i])
+        if denom != 0.0:
+            out[i] = 100.0 * gain_avg[i] / denom
+    return out
+
+
+@njit(cache=True, nogil=True)
+def atr_kernel(high, low, close, length):
+    """ATR 序列（前 length-1 个值为 NaN；K线不足 length 根时全部为 NaN）"""
+    n = close.shape[0]
+    out = np.full(n, np.nan)
+    if n < length:
+        return out
+    hl_range = high - low
+    # 与 pandas-ta 的 non_zero_range 一致：存在零波幅时整体加上 epsilon
+    if np.any(hl_range == 0.0):
+        hl_range = hl_range + EPSILON
+    true_range = np.empty(n)
+    true_range[0] = abs(hl_range[0])
+    for i in range(1, n):
+        prev_close = close[i - 1]
+        true_range[i] = max(abs(hl_range[i]), abs(high[i] - prev_close), abs(prev_close - low[i]))
+    true_range[length - 1] = true_range[:length].mean()
+    _ewm_from(true_range, length - 1, 1.0 / length, out)
+    return out
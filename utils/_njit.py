@@ -0,0 +1,18 @@
+"""
+可选的 numba JIT 装饰器 - 未安装 numba 时退化为原函数
+"""
+from utils.logger import logger
+
+try:
+    from numba import njit
+except ImportError:
+    logger.debug("numba未安装，JIT加速不可用，使用纯NumPy实现")
+
+    def njit(*args, **kwargs):
+        """numba.njit 的无操作替代，支持 @njit 和 @njit(...) 两种写法"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorator(func):
+            return func
+        return decorator
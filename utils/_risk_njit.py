@@ -0,0 +1,32 @@
+"""
+风险回报比计算内核 - 对一批开仓决策一次性计算风险回报比
+"""
+import numpy as np
+from utils._njit import njit
+
+
+@njit(cache=True, nogil=True)
+def rrr_kernel(price, stop_loss, take_profit, is_long, min_ratio):
+    """计算每个决策的风险回报比及是否达标
+    
+    做多：风险 = 当前价 - 止损，收益 = 止盈 - 当前价
+    做空：风险 = 止损 - 当前价，收益 = 当前价 - 止盈
+    风险 <= 0（或为 NaN）时判定为不通过，比值记为 0
+    
+    Returns:
+        (is_valid, ratio)：bool 数组与 float64 数组
+    """
+    n = price.shape[0]
+    is_valid = np.zeros(n, dtype=np.bool_)
+    ratio = np.zeros(n, dtype=np.float64)
+    for i in range(n):
+        if is_long[i]:
+            risk = price[i] - stop_loss[i]
+            reward = take_profit[i] - price[i]
+        else:
+            risk = stop_loss[i] - price[i]
+            reward = price[i] - take_profit[i]
+        if risk > 0:
+            ratio[i] = reward / risk
+            is_valid[i] = ratio[i] >= min_ratio
+    return is_valid, ratio
@@ -0,0 +1,24 @@
+"""
+信号格式化分类内核 - 对所有币种的指标数组一次性计算趋势状态码
+"""
+import numpy as np
+from utils._njit import njit
+
+# 状态码 -> 文本
+PRICE_VS_EMA_TEXT = {1: "高于", -1: "低于", 0: "等于"}
+MACD_SIGNAL_TEXT = {1: "看涨", -1: "看跌", 0: "中性"}
+RSI_STATUS_TEXT = {1: "超买", -1: "超卖", 0: "正常"}
+
+RSI_OVERBOUGHT = 70.0
+RSI_OVERSOLD = 30.0
+
+
+@njit(cache=True, nogil=True)
+def classify(prices, ema20, macd, rsi14):
+    """计算价格相对EMA20、MACD方向、RSI14状态的状态码（1/-1/0，int8数组）；NaN 记为 0"""
+    diff = prices - ema20
+    # NaN 转 int8 未定义（numba 下结果不确定），先映射为 0
+    vs_ema_code = np.where(np.isnan(diff), 0.0, np.sign(diff)).astype(np.int8)
+    macd_code = np.where(np.isnan(macd), 0.0, np.sign(macd)).astype(np.int8)
+    rsi_code = ((rsi14 > RSI_OVERBOUGHT).astype(np.int8) - (rsi14 < RSI_OVERSOLD).astype(np.int8))
+    return vs_ema_code, macd_code, rsi_code
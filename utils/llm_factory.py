@@ -1,7 +1,10 @@
 """
 LLM工厂类 - 统一管理LLM初始化
 """
-from typing import Optional
+import os
+import hashlib
+import threading
+from typing import Optional, Tuple
 from utils.logger import logger
 
 try:
@@ -14,13 +17,92 @@ except ImportError as e:
     ChatAnthropic = None
     ChatOllama = None
 
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# 共享HTTP连接池的keepalive连接上限
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 32
+
+
+# 按配置共享的LLM实例：相同配置的交易员共享同一个客户端及其HTTP连接池
+_llm_cache: dict = {}
+_llm_cache_lock = threading.Lock()
+
+
+def _cache_key(provider: str, model_name: str, api_key: str, base_url: str, temperature: float) -> Tuple:
+    """缓存键：API密钥只保留哈希，避免明文常驻在缓存键中"""
+    api_key_hash = hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()
+    return (provider, model_name, api_key_hash, base_url or '', temperature)
+
+
+def _get_or_create_llm(provider: str, model_name: str, api_key: str, base_url: str, temperature: float) -> Optional[object]:
+    """返回共享的LLM实例，不存在时创建
+    
+    多个交易员并发启动时在锁内创建，保证同一配置只建立一个客户端（一个连接池）。
+    创建失败时直接抛出异常且不写入缓存，由调用方处理
+    """
+    key = _cache_key(provider, model_name, api_key, base_url, temperature)
+    with _llm_cache_lock:
+        llm = _llm_cache.get(key)
+        if llm is None:
+            llm = _make_llm(provider, model_name, api_key, base_url, temperature)
+            if llm is not None:
+                _llm_cache[key] = llm
+        return llm
+
+
+def _make_llm(provider: str, model_name: str, api_key: str, base_url: str, temperature: float) -> Optional[object]:
+    """根据提供商创建LLM实例（httpx 的同步/异步客户端均可安全地并发使用）"""
+    if provider == 'openai':
+        if not ChatOpenAI:
+            logger.error("ChatOpenAI未导入，请安装langchain-openai")
+            return None
+        http_kwargs = {}
+        if httpx:
+            limits = httpx.Limits(max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS)
+            http_kwargs = {
+                'http_client': httpx.Client(limits=limits),
+                'http_async_client': httpx.AsyncClient(limits=limits),
+            }
+        return ChatOpenAI(
+            model=model_name,
+            api_key=api_key,
+            base_url=base_url if base_url else None,
+            temperature=temperature,
+            **http_kwargs,
+        )
+    elif provider == 'anthropic':
+        if not ChatAnthropic:
+            logger.error("ChatAnthropic未导入，请安装langchain-anthropic")
+            return None
+        return ChatAnthropic(
+            model=model_name,
+            api_key=api_key,
+            base_url=base_url if base_url else None,
+            temperature=temperature,
+        )
+    elif provider == 'ollama':
+        if not ChatOllama:
+            logger.error("ChatOllama未导入，请安装langchain-ollama")
+            return None
+        return ChatOllama(
+            model=model_name,
+            temperature=temperature,
+            base_url=base_url if base_url else 'http://localhost:11434',
+        )
+    else:
+        logger.warning(f"不支持的LLM提供商: {provider}")
+        return None
+
 
 class LLMFactory:
     """LLM工厂类 - 统一创建和管理LLM实例"""
     
     @staticmethod
     def create_llm(ai_model_config: dict) -> Optional[object]:
-        """创建LLM实例
+        """创建LLM实例（相同配置复用缓存的实例，共享HTTP连接池）
         
         Args:
             ai_model_config: AI模型配置字典，包含：
@@ -48,39 +130,27 @@ class LLMFactory:
         temperature = ai_model_config.get('temperature', 0.0)
         
         try:
-            if provider == 'openai':
-                if not ChatOpenAI:
-                    logger.error("ChatOpenAI未导入，请安装langchain-openai")
-                    return None
-                return ChatOpenAI(
-                    model=model_name,
-                    api_key=api_key,
-                    base_url=base_url if base_url else None,
-                    temperature=temperature,
-                )
-            elif provider == 'anthropic':
-                if not ChatAnthropic:
-                    logger.error("ChatAnthropic未导入，请安装langchain-anthropic")
-                    return None
-                return ChatAnthropic(
-                    model=model_name,
-                    api_key=api_key,
-                    base_url=base_url if base_url else None,
-                    temperature=temperature,
-                )
-            elif provider == 'ollama':
-                if not ChatOllama:
-                    logger.error("ChatOllama未导入，请安装langchain-ollama")
-                    return None
-                return ChatOllama(
-                    model=model_name,
-                    temperature=temperature,
-                    base_url=base_url if base_url else 'http://localhost:11434',
-                )
-            else:
-                logger.warning(f"不支持的LLM提供商: {provider}")
-                return None
+            return _get_or_create_llm(provider, model_name, api_key, base_url, temperature)
         except Exception as e:
             logger.error(f"创建LLM实例失败: {e}", exc_info=True)
             return None
 
+    @staticmethod
+    def structured_output_method(ai_model_config: dict) -> Optional[str]:
+        """返回结构化输出方式
+        
+        - ollama: 使用 json_schema（服务端按 schema 约束解码，无法生成非法JSON）
+        - 自部署的 OpenAI 兼容服务（如 vLLM）：配置 guided_json=True 或环境变量 AI_GUIDED_JSON=true 时
+          使用 json_schema（服务端 guided decoding）
+        - 其他情况返回 None，使用 LangChain 默认方式（function calling）
+        """
+        provider = (ai_model_config or {}).get('provider', 'ollama')
+        if provider == 'ollama':
+            return 'json_schema'
+        
+        guided_json = (ai_model_config or {}).get(
+            'guided_json', os.getenv("AI_GUIDED_JSON", "false").lower() == "true"
+        )
+        if provider == 'openai' and guided_json:
+            return 'json_schema'
+        return None
@@ -1,5 +1,6 @@
 # logger.py
 import sys
+import time
 from loguru import logger
 from pathlib import Path
 
@@ -39,3 +40,26 @@ logger.add(
     diagnose=True,          # 详细诊断
     encoding="utf-8",
 )
+
+
+# 4. 循环内的错误日志限流：完整堆栈格式化开销较大，同一对象持续失败时只定期输出
+TRACEBACK_LOG_INTERVAL_SECONDS = 60
+
+
+def log_error_throttled(last_logged: dict, key, message: str, exc: BaseException,
+                        interval: float = TRACEBACK_LOG_INTERVAL_SECONDS) -> None:
+    """记录错误：同一 key 的完整堆栈每 interval 秒最多输出一次，其余只输出简短错误信息
+
+    Args:
+        last_logged: 调用方持有的 {key: 上次输出堆栈的 monotonic 时间}
+        key: 限流维度（如币种符号）
+        message: 已格式化的错误信息（始终输出）
+        exc: 捕获的异常
+        interval: 堆栈输出的最小间隔（秒）
+    """
+    now = time.monotonic()
+    if now - last_logged.get(key, float('-inf')) >= interval:
+        last_logged[key] = now
+        logger.opt(depth=1, exception=exc).error(message)
+    else:
+        logger.opt(depth=1).error(message)